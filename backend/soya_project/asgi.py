@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'soya_project.settings')
 
 application = get_asgi_application()
+
+# Spawn the password hashing pool now rather than on the first login
+from soya_store import hashing_pool  # noqa: E402
+
+hashing_pool.pool.start()
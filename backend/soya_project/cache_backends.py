@@ -0,0 +1,232 @@
+"""
+Cache backends for the shared cache tier configured in settings.CACHES.
+
+``TieredCache`` fronts a shared backend (Redis, or ``LockingFileBasedCache``
+when no Redis is available) with a small per-process LRU for hot keys, so
+throttle counters and cached payloads are shared by every worker process
+while the hottest reads stay in memory.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.move import file_move_safe
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked operations
+    fcntl = None
+
+_MISSING = object()
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """
+    File-based cache whose ``add``/``incr``/``decr`` are atomic across
+    processes on the same host, by holding an ``flock`` on one of a fixed set
+    of lock files while they run.
+
+    ``incr``/``decr`` rewrite the value in place and keep the entry's expiry.
+    BaseCache's versions go through ``set()`` with the default timeout, which
+    would cut a day-long throttle window to five minutes and cull the cache
+    directory on every counted request.
+    """
+    LOCK_STRIPES = 64
+
+    @contextmanager
+    def _locked(self, key, version):
+        if fcntl is None:
+            yield
+            return
+        self._createdir()
+        stripe = int(hashlib.md5(self.make_key(key, version).encode(), usedforsecurity=False).hexdigest(), 16)
+        path = os.path.join(self._dir, f'stripe-{stripe % self.LOCK_STRIPES}.lock')
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(key, version):
+            return super().add(key, value, timeout, version)
+
+    def _add_delta(self, key, delta, version):
+        """Add ``delta`` to the stored value, keeping its expiry; call with the lock held"""
+        fname = self._key_to_file(key, version)
+        try:
+            with open(fname, 'rb') as f:
+                expiry = pickle.load(f)
+                if expiry is not None and expiry < time.time():
+                    raise ValueError(f"Key '{key}' not found")
+                value = pickle.loads(zlib.decompress(f.read())) + delta
+        except FileNotFoundError:
+            raise ValueError(f"Key '{key}' not found")
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        renamed = False
+        try:
+            with open(fd, 'wb') as f:
+                f.write(pickle.dumps(expiry, self.pickle_protocol))
+                f.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+            file_move_safe(tmp_path, fname, allow_overwrite=True)
+            renamed = True
+        finally:
+            if not renamed:
+                os.remove(tmp_path)
+        return value
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked(key, version):
+            return self._add_delta(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        with self._locked(key, version):
+            return self._add_delta(key, -delta, version)
+
+
+class TieredCache(BaseCache):
+    """
+    A per-process LRU with a short TTL in front of a shared cache alias.
+
+    Only keys starting with one of ``LOCAL_KEY_PREFIXES`` are kept locally,
+    and for at most ``LOCAL_TIMEOUT`` seconds: that bounds how stale another
+    process's write can look. Counters (``incr``/``decr``) always go to the
+    shared cache so they stay exact.
+
+    OPTIONS: ``SHARED`` (alias of the shared cache), ``LOCAL_MAX_ENTRIES``,
+    ``LOCAL_TIMEOUT``, ``LOCAL_KEY_PREFIXES``.
+    """
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1024)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local_prefixes = tuple(options.get('LOCAL_KEY_PREFIXES', ()))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _is_local(self, key):
+        return self._local_prefixes and key.startswith(self._local_prefixes)
+
+    def _local_get(self, key, version):
+        with self._lock:
+            entry = self._local.get((key, version))
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._local[(key, version)]
+                return _MISSING
+            self._local.move_to_end((key, version))
+            return value
+
+    def _local_set(self, key, value, timeout, version):
+        local_timeout = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout <= 0:
+            return
+        with self._lock:
+            self._local[(key, version)] = (value, time.monotonic() + local_timeout)
+            self._local.move_to_end((key, version))
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop((key, version), None)
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self.shared.get(key, default, version)
+        value = self._local_get(key, version)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(key, version) if self._is_local(key) else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version)
+            for key, value in fetched.items():
+                if self._is_local(key):
+                    self._local_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        if self._is_local(key):
+            self._local_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if self._is_local(key) and key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added and self._is_local(key):
+            self._local_set(key, value, timeout, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(key, version)
+        return self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        if self._is_local(key) and self._local_get(key, version) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        return self.shared.clear()
+
+    def close(self, **kwargs):
+        return self.shared.close(**kwargs)
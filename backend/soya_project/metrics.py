@@ -0,0 +1,349 @@
+"""
+Prometheus-style metrics shared by every worker process.
+
+Each process keeps its counters and histograms in memory and periodically
+writes a snapshot to its own file in ``METRICS_DIR``. A scrape of
+``/metrics`` flushes the scraping process, then sums the snapshots of all
+processes, so the totals are correct whichever worker answers the scrape.
+Snapshot files are named after the process ID and start time and are never
+reused. On each scrape, the snapshots of processes that have exited are
+folded into ``archive.json`` and deleted, so their counts survive without
+the directory growing with every worker restart. ``METRICS_DIR`` must be
+local to the host, since liveness is checked by process ID.
+
+``/metrics`` is only served without ``METRICS_TOKEN`` under ``DEBUG``.
+
+Gauges that other processes cannot contribute to (catalog cache counters,
+which already live in the shared cache, and database connections from
+``pg_stat_activity``) are read at scrape time.
+"""
+import bisect
+import glob
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots of exited processes are kept
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'soya_http_requests_total': ('counter', 'HTTP responses by route, method and status'),
+    'soya_http_request_duration_seconds': ('histogram', 'Time to produce a response, by route and method'),
+    'soya_db_queries_total': ('counter', 'Database queries run while handling requests, by route'),
+    'soya_throttle_rejections_total': ('counter', 'Requests rejected by a rate throttle, by scope'),
+    'soya_security_blocks_total': ('counter', 'Requests blocked by SecurityMiddleware, by threat'),
+    'soya_password_hashes_total': ('counter', 'Password hashes by where they ran: pool, inline, or rejected when the pool was full'),
+    'soya_password_hash_queue_depth': ('histogram', "Hashes already pending in the process's pool when one was submitted"),
+    'soya_password_hash_duration_seconds': ('histogram', 'Time a request waited for a password hash, including queueing, by mode'),
+}
+
+# Summed snapshots of processes that have exited
+ARCHIVE = 'archive.json'
+
+# Histograms whose values are not latencies
+BUCKETS = {
+    'soya_password_hash_queue_depth': (0, 1, 2, 4, 8, 16, 32, 64, 128),
+}
+
+
+class Registry:
+    """In-process metric values, flushed to this process's snapshot file"""
+    def __init__(self, directory, flush_interval, buckets=DEFAULT_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self.counters = defaultdict(float)
+        # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.path = None
+        self.pid = None
+        self.last_flush = 0.0
+
+    def _claim(self):
+        """
+        Give this process its own snapshot file. Called with the lock held;
+        after a fork, the values inherited from the parent are dropped, since
+        the parent's own file already counts them.
+        """
+        if self.pid != os.getpid():
+            if self.pid is not None:
+                self.counters.clear()
+                self.histograms.clear()
+            self.pid = os.getpid()
+            self.path = os.path.join(self.directory, f'{self.pid}-{time.time_ns()}.json')
+
+    def buckets_for(self, name):
+        return BUCKETS.get(name, self.buckets)
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self._claim()
+            self.counters[(name, labels)] += amount
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            self._claim()
+            buckets = self.buckets_for(name)
+            values = self.histograms.get((name, labels))
+            if values is None:
+                values = self.histograms[(name, labels)] = [0] * (len(buckets) + 1) + [0.0]
+            values[bisect.bisect_left(buckets, value)] += 1
+            values[-1] += value
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write this process's values to its snapshot file, atomically"""
+        with self.lock:
+            self._claim()
+            self.last_flush = time.monotonic()
+            snapshot = {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), values] for (name, labels), values in self.histograms.items()],
+            }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w') as fh:
+                json.dump(snapshot, fh)
+            os.replace(temporary, self.path)
+        except OSError as exc:
+            logger.warning(f"Could not write metrics snapshot {self.path}: {exc}")
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _add(counters, histograms, snapshot):
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def archive_exited(self):
+        """
+        Fold the snapshots of exited processes into the archive and delete
+        them. Scrapes in other processes wait on an ``flock`` meanwhile, so
+        no snapshot is archived twice.
+        """
+        if fcntl is None:
+            return
+        exited = []
+        for path in glob.glob(os.path.join(self.directory, '*-*.json')):
+            pid = os.path.basename(path).split('-', 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not self._alive(int(pid)):
+                exited.append(path)
+        if not exited:
+            return
+
+        with open(os.path.join(self.directory, '.archive.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                archive = os.path.join(self.directory, ARCHIVE)
+                counters = defaultdict(float)
+                histograms = {}
+                for path in [archive] + exited:
+                    snapshot = self._read(path)
+                    if snapshot is not None:
+                        self._add(counters, histograms, snapshot)
+                try:
+                    temporary = f'{archive}.tmp'
+                    with open(temporary, 'w') as fh:
+                        json.dump({
+                            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                            'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()],
+                        }, fh)
+                    os.replace(temporary, archive)
+                    for path in exited:
+                        os.remove(path)
+                except OSError as exc:
+                    logger.warning(f"Could not archive metrics snapshots of exited processes: {exc}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def collect(self):
+        """Sum the snapshots of every process, live or exited"""
+        self.flush()
+        self.archive_exited()
+        counters = defaultdict(float)
+        histograms = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            snapshot = self._read(path)
+            if snapshot is not None:
+                self._add(counters, histograms, snapshot)
+        return counters, histograms
+
+
+registry = Registry(
+    getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, '.metrics')),
+    getattr(settings, 'METRICS_FLUSH_INTERVAL', 5),
+)
+
+
+def _labels(**labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def observe_request(route, method, status, seconds, queries):
+    registry.inc('soya_http_requests_total', _labels(route=route, method=method, status=status))
+    registry.observe('soya_http_request_duration_seconds', _labels(route=route, method=method), seconds)
+    if queries:
+        registry.inc('soya_db_queries_total', _labels(route=route), queries)
+
+
+def throttle_rejected(scope):
+    registry.inc('soya_throttle_rejections_total', _labels(scope=scope))
+
+
+def security_blocked(threat):
+    registry.inc('soya_security_blocks_total', _labels(threat=threat))
+
+
+def password_hash_submitted(depth):
+    registry.observe('soya_password_hash_queue_depth', (), depth)
+
+
+def password_hash_finished(mode, seconds):
+    registry.inc('soya_password_hashes_total', _labels(mode=mode))
+    registry.observe('soya_password_hash_duration_seconds', _labels(mode=mode), seconds)
+
+
+def password_hash_rejected():
+    registry.inc('soya_password_hashes_total', _labels(mode='rejected'))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _catalog_cache_lines():
+    from soya_store import catalog_cache
+    stats = catalog_cache.stats()
+    lines = [
+        '# HELP soya_catalog_cache_requests_total Catalog cache lookups by result',
+        '# TYPE soya_catalog_cache_requests_total counter',
+        f"soya_catalog_cache_requests_total{{result=\"hit\"}} {stats['hits']}",
+        f"soya_catalog_cache_requests_total{{result=\"miss\"}} {stats['misses']}",
+    ]
+    if stats['hit_ratio'] is not None:
+        lines += [
+            '# HELP soya_catalog_cache_hit_ratio Share of catalog cache lookups that hit',
+            '# TYPE soya_catalog_cache_hit_ratio gauge',
+            f"soya_catalog_cache_hit_ratio {stats['hit_ratio']}",
+        ]
+    return lines
+
+
+def _db_connection_lines():
+    lines = [
+        '# HELP soya_db_connections Server connections to this database, by state',
+        '# TYPE soya_db_connections gauge',
+    ]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY 1 ORDER BY 1"
+            )
+            lines += [f'soya_db_connections{_format_labels((("state", state),))} {count}' for state, count in cursor.fetchall()]
+            cursor.execute('SHOW max_connections')
+            max_connections = cursor.fetchone()[0]
+        lines += [
+            '# HELP soya_db_max_connections Server connection limit',
+            '# TYPE soya_db_max_connections gauge',
+            f'soya_db_max_connections {max_connections}',
+        ]
+    return lines
+
+
+def render():
+    """The metrics of all processes in the Prometheus text exposition format"""
+    counters, histograms = registry.collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*registry.buckets_for(name), '+Inf'], values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    for collector in (_catalog_cache_lines, _db_connection_lines):
+        try:
+            lines += collector()
+        except Exception as exc:  # A broken collector must not take the whole scrape down
+            logger.warning(f"Metrics collector {collector.__name__} failed: {exc}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Serve ``/metrics``. Scrapers must send ``METRICS_TOKEN`` as
+    ``Authorization: Bearer <token>``; without a token configured, the
+    endpoint is only open under ``DEBUG``.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden('Invalid metrics token')
+    elif not settings.DEBUG:
+        return HttpResponseForbidden('Set METRICS_TOKEN to serve metrics')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
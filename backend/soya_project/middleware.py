@@ -1,8 +1,13 @@
 import re
 import logging
-from django.http import HttpResponseForbidden
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from django.http import HttpResponse, HttpResponseForbidden
 from django.conf import settings
+from django.db import connections
 from datetime import datetime
+from . import metrics
 
 # Setup logger
 logger = logging.getLogger('soya_project.middleware')
@@ -10,7 +15,23 @@ logger = logging.getLogger('soya_project.middleware')
 class SecurityMiddleware:
     """
     Middleware to add additional security measures to the application.
+
+    Query parameters, form fields and JSON bodies are scanned for SQL
+    injection and XSS patterns in a single pass: the body is decoded once and
+    each value is matched against one compiled pattern covering both
+    families. Each value is still matched on its own, so ``^``/``$`` anchor
+    to the value as before, and SQL findings anywhere in the request still
+    take precedence over XSS ones.
+
+    JSON bodies over ``SECURITY_SCAN_MAX_BYTES`` are rejected with a 413 by
+    default, since scanning only a prefix would let a payload be padded past
+    the limit. Set ``SECURITY_SCAN_OVERSIZE`` to ``'truncate'`` to scan just
+    the first ``SECURITY_SCAN_MAX_BYTES`` instead. Safe-method requests whose
+    whole path matches one of the ``SECURITY_SCAN_EXEMPT_PATHS`` patterns are
+    not scanned at all.
     """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    
     def __init__(self, get_response):
         self.get_response = get_response
         # SQL injection patterns
@@ -31,19 +52,33 @@ class SecurityMiddleware:
             r'<iframe',
             r'<img.*?onerror',
         ]
-        self.xss_regex = re.compile('|'.join(self.xss_patterns), re.IGNORECASE)
+        
+        # One automaton for both families; the named group that matched tells them apart
+        self.scan_regex = re.compile(
+            '(?P<sql>{})|(?P<xss>{})'.format('|'.join(self.sql_patterns), '|'.join(self.xss_patterns)),
+            re.IGNORECASE,
+        )
+        self.max_scan_bytes = getattr(settings, 'SECURITY_SCAN_MAX_BYTES', 64 * 1024)
+        self.oversize = getattr(settings, 'SECURITY_SCAN_OVERSIZE', 'reject')
+        # Anchored to the whole path, so an exempt route never exempts its siblings
+        exempt_paths = getattr(settings, 'SECURITY_SCAN_EXEMPT_PATHS', ())
+        self.exempt_regex = re.compile('|'.join(f'(?:{path})' for path in exempt_paths)) if exempt_paths else None
 
     def __call__(self, request):
         # Log basic request info
         self.log_request_info(request)
         
-        # Check for SQL injection
-        if self.check_for_sql_injection(request):
+        # Check for SQL injection and XSS
+        threat = self.scan_request(request)
+        if threat:
+            metrics.security_blocked(threat)
+        if threat == 'oversize':
+            self.log_security_incident(request, "Request body too large to scan")
+            return HttpResponse("Request body too large", status=413)
+        if threat == 'sql':
             self.log_security_incident(request, "SQL Injection attempt detected")
             return HttpResponseForbidden("Potential SQL injection detected")
-        
-        # Check for XSS
-        if self.check_for_xss(request):
+        if threat == 'xss':
             self.log_security_incident(request, "XSS attack attempt detected")
             return HttpResponseForbidden("Potential XSS attack detected")
         
@@ -76,53 +111,67 @@ class SecurityMiddleware:
         
         logger.warning(f"SECURITY INCIDENT: {message} - Details: {log_data}")
     
-    def check_for_sql_injection(self, request):
-        """Check for potential SQL injection in request parameters"""
-        # Check GET params
-        for key, value in request.GET.items():
-            if isinstance(value, str) and self.sql_regex.search(value):
-                logger.warning(f"SQL Injection pattern detected in GET param '{key}': {value}")
-                return True
+    def is_exempt(self, request):
+        """Trusted read-only routes skip scanning"""
+        return (
+            self.exempt_regex is not None
+            and request.method in self.SAFE_METHODS
+            and self.exempt_regex.fullmatch(request.path) is not None
+        )
+    
+    def scan_sources(self, request):
+        """
+        Yield ``(source, text)`` for each value that is scanned, where
+        ``source`` names it in log messages. Yields ``(None, None)`` for a
+        JSON body that is too large to scan and must be rejected.
+        """
+        for key, values in request.GET.lists():
+            for value in values:
+                yield f"GET param '{key}': {value}", value
         
-        # Check POST params
         if request.method == 'POST' and request.content_type == 'application/x-www-form-urlencoded':
-            for key, value in request.POST.items():
-                if isinstance(value, str) and self.sql_regex.search(value):
-                    logger.warning(f"SQL Injection pattern detected in POST param '{key}': {value}")
-                    return True
-        
-        # Check JSON body
-        if request.content_type == 'application/json' and hasattr(request, 'body'):
-            body_str = request.body.decode('utf-8', errors='ignore')
-            if self.sql_regex.search(body_str):
-                logger.warning(f"SQL Injection pattern detected in JSON body")
-                return True
-        
-        return False
-    
-    def check_for_xss(self, request):
-        """Check for potential XSS in request parameters"""
-        # Check GET params
-        for key, value in request.GET.items():
-            if isinstance(value, str) and self.xss_regex.search(value):
-                logger.warning(f"XSS pattern detected in GET param '{key}': {value}")
-                return True
-        
-        # Check POST params
-        if request.method == 'POST' and request.content_type == 'application/x-www-form-urlencoded':
-            for key, value in request.POST.items():
-                if isinstance(value, str) and self.xss_regex.search(value):
-                    logger.warning(f"XSS pattern detected in POST param '{key}': {value}")
-                    return True
+            for key, values in request.POST.lists():
+                for value in values:
+                    yield f"POST param '{key}': {value}", value
+        
+        if request.content_type == 'application/json':
+            body = request.body
+            if self.max_scan_bytes and len(body) > self.max_scan_bytes:
+                if self.oversize != 'truncate':
+                    yield None, None
+                    return
+                logger.info(f"Scanning first {self.max_scan_bytes} of {len(body)} body bytes for {request.path}")
+                body = body[:self.max_scan_bytes]
+            yield 'JSON body', body.decode('utf-8', errors='ignore')
+    
+    def scan_request(self, request):
+        """
+        Scan the request once for both pattern families.
+        Returns ``'sql'``, ``'xss'``, ``'oversize'`` or None.
+        """
+        if self.is_exempt(request):
+            return None
         
-        # Check JSON body
-        if request.content_type == 'application/json' and hasattr(request, 'body'):
-            body_str = request.body.decode('utf-8', errors='ignore')
-            if self.xss_regex.search(body_str):
-                logger.warning(f"XSS pattern detected in JSON body")
-                return True
+        xss_source = None
+        for source, text in self.scan_sources(request):
+            if source is None:
+                logger.warning(f"JSON body over SECURITY_SCAN_MAX_BYTES ({self.max_scan_bytes}) rejected unscanned")
+                return 'oversize'
+            match = self.scan_regex.search(text)
+            if match is None:
+                continue
+            # Nothing matched before match.start(), and SQL alternatives are
+            # tried first there, so only a later SQL match can still exist
+            if match.lastgroup == 'sql' or self.sql_regex.search(text, match.start() + 1):
+                logger.warning(f"SQL Injection pattern detected in {source}")
+                return 'sql'
+            if xss_source is None:
+                xss_source = source
         
-        return False
+        if xss_source is not None:
+            logger.warning(f"XSS pattern detected in {xss_source}")
+            return 'xss'
+        return None
     
     def add_security_headers(self, response):
         """Add security headers to response"""
@@ -142,4 +191,139 @@ class SecurityMiddleware:
         if not settings.DEBUG:
             response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
         
-        return response
\ No newline at end of file
+        return response
+
+class QueryRecorder:
+    """
+    ``execute_wrapper`` that times every query run while it is installed and
+    groups them by shape: the SQL with literals and IN-lists collapsed, so the
+    same query issued for different rows counts as one shape.
+    """
+    literal_regex = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    in_list_regex = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+    
+    def __init__(self):
+        self.queries = []
+        self.shapes = defaultdict(int)
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+            self.shapes[self.shape(sql)] += 1
+    
+    @classmethod
+    def shape(cls, sql):
+        return cls.in_list_regex.sub('IN (...)', cls.literal_regex.sub('?', sql))
+    
+    @property
+    def db_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+
+class InstrumentationMiddleware:
+    """
+    Per-request SQL and timing instrumentation.
+    
+    Counts queries and database time on every connection, measures time spent
+    in the view and (for DRF and template responses) in rendering, and with
+    ``INSTRUMENTATION_SERVER_TIMING`` on reports them in a ``Server-Timing``
+    header. That header is off by default, since it hands any client the
+    query count and database time of each request. Requests slower than
+    ``INSTRUMENTATION_SLOW_REQUEST_MS`` are logged with their slowest
+    queries. A query shape repeated ``INSTRUMENTATION_N_PLUS_ONE_THRESHOLD``
+    times in one request is flagged as a likely N+1, once per endpoint and
+    shape per process.
+    
+    Queries run while a streaming response is consumed happen after this
+    middleware returns and are not counted.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+        self.n_plus_one_threshold = getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)
+        self.top_queries = getattr(settings, 'INSTRUMENTATION_TOP_QUERIES', 5)
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', False)
+        self.flagged = set()
+    
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.instrumentation = {'started': time.perf_counter(), 'recorder': recorder}
+        
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        
+        timings = self.timings(request)
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(timings, len(recorder.queries))
+        self.report(request, timings, recorder)
+        
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe_request(
+            route=match.url_name if match and match.url_name else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            seconds=timings['total'] / 1000,
+            queries=len(recorder.queries),
+        )
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'instrumentation'):
+            request.instrumentation['view_started'] = time.perf_counter()
+    
+    def process_template_response(self, request, response):
+        """The view has returned an unrendered response; rendering comes next"""
+        if hasattr(request, 'instrumentation'):
+            stats = request.instrumentation
+            stats['view_finished'] = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: stats.__setitem__('render_finished', time.perf_counter()))
+        return response
+    
+    def timings(self, request):
+        """Milliseconds spent in total, in the database, in the view and in rendering"""
+        stats = request.instrumentation
+        finished = time.perf_counter()
+        timings = {
+            'total': (finished - stats['started']) * 1000,
+            'db': stats['recorder'].db_ms,
+        }
+        if 'view_started' in stats:
+            view_finished = stats.get('view_finished', finished)
+            timings['view'] = (view_finished - stats['view_started']) * 1000
+            if 'render_finished' in stats:
+                timings['render'] = (stats['render_finished'] - view_finished) * 1000
+        return timings
+    
+    def server_timing_header(self, timings, query_count):
+        metrics = []
+        for name, duration in timings.items():
+            description = f';desc="{query_count} queries"' if name == 'db' else ''
+            metrics.append(f'{name};dur={duration:.1f}{description}')
+        return ', '.join(metrics)
+    
+    def endpoint(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return f"{request.method} {match.view_name if match and match.view_name else request.path}"
+    
+    def report(self, request, timings, recorder):
+        endpoint = self.endpoint(request)
+        
+        if timings['total'] >= self.slow_request_ms:
+            slowest = sorted(recorder.queries, key=lambda query: query[1], reverse=True)[:self.top_queries]
+            details = ''.join(f"\n  {duration:.1f}ms {sql[:500]}" for sql, duration in slowest)
+            logger.warning(
+                f"Slow request: {endpoint} took {timings['total']:.1f}ms "
+                f"({len(recorder.queries)} queries, {timings['db']:.1f}ms in the database){details}"
+            )
+        
+        for shape, count in recorder.shapes.items():
+            if count < self.n_plus_one_threshold:
+                continue
+            level = logging.DEBUG if (endpoint, shape) in self.flagged else logging.WARNING
+            self.flagged.add((endpoint, shape))
+            logger.log(level, f"Possible N+1 on {endpoint}: {count} queries shaped like {shape[:300]}")
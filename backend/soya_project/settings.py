@@ -38,6 +38,22 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 SECURE_BROWSER_XSS_FILTER = True
 X_FRAME_OPTIONS = 'DENY'
 
+# Request scanning in soya_project.middleware.SecurityMiddleware
+# JSON bodies over SECURITY_SCAN_MAX_BYTES (0 scans everything) are rejected with
+# a 413, or with SECURITY_SCAN_OVERSIZE = 'truncate' only their first
+# SECURITY_SCAN_MAX_BYTES are scanned, which lets padded payloads through
+SECURITY_SCAN_MAX_BYTES = int(os.environ.get('SECURITY_SCAN_MAX_BYTES', 64 * 1024))
+SECURITY_SCAN_OVERSIZE = os.environ.get('SECURITY_SCAN_OVERSIZE', 'reject')
+# GET/HEAD/OPTIONS requests whose whole path matches one of these regexes are
+# trusted read-only routes and not scanned. Only catalog routes that take no
+# free-text parameters are listed; search and by_category are still scanned
+SECURITY_SCAN_EXEMPT_PATHS = [
+    r'/static/.*',
+    r'/media/.*',
+    r'/api/products/(\d+/)?',
+    r'/api/products/(featured|bestsellers)/',
+]
+
 # Session security settings
 SESSION_COOKIE_SECURE = os.environ.get('DJANGO_SECURE_COOKIES', 'False').lower() == 'true'
 SESSION_COOKIE_HTTPONLY = True
@@ -63,6 +79,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -74,6 +91,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'soya_project.middleware.InstrumentationMiddleware',  # First, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -125,6 +143,39 @@ DATABASES = {
 }
 
 
+# Cache tier
+# Throttle counters, login-attempt counts and cached payloads must be visible to
+# every worker process, so the default cache fronts a shared backend: Redis when
+# REDIS_URL is set, otherwise a lock-protected file cache shared by all workers
+# on the host. Hot catalog keys are also kept in a small per-process LRU.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'soya_project.cache_backends.LockingFileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'soya_project.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('LOCAL_CACHE_MAX_ENTRIES', 1024)),
+            'LOCAL_TIMEOUT': int(os.environ.get('LOCAL_CACHE_TIMEOUT', 5)),  # Max staleness of local copies
+            'LOCAL_KEY_PREFIXES': ['catalog:'],
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -143,6 +194,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PBKDF2 iterations per password hash (see soya_store.hashers). Django 5.2
+# defaults to 1,000,000; every signup and login pays for them in CPU time
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 1000000))
+
+# Password hashes run in a pool of this many processes per web worker, started
+# when the worker boots; 0 hashes on the request thread. The pools of all web
+# workers share the host's cores, so size it from the total: keep web workers
+# x PASSWORD_HASHING_WORKERS near the core count (4 web workers on 8 cores: 2).
+# Past MAX_PENDING waiting or running hashes, logins and signups get a 503
+# with Retry-After
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0))
+PASSWORD_HASHING_MAX_PENDING = int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 16))
+
+PASSWORD_HASHERS = [
+    'soya_store.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -180,18 +252,28 @@ AUTH_USER_MODEL = 'soya_store.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'soya_store.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON; both fall back to DRF's stdlib json when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': [
+        'soya_store.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'soya_store.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     # Rate limiting settings
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'soya_store.throttling.CounterAnonRateThrottle',
+        'soya_store.throttling.CounterUserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',        # Limit anonymous users to 100 requests per day
@@ -200,10 +282,51 @@ REST_FRAMEWORK = {
         'register': '3/hour',     # Limit registration to 3 per hour
     },
     # Exception handling
-    'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    'EXCEPTION_HANDLER': 'soya_store.exceptions.exception_handler',
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
 }
 
+# Catalog cache settings
+# Serialized product payloads are invalidated by version bumps on Product writes,
+# so the timeout only bounds how long unreachable entries linger
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60 * 60))
+
+# Maximum number of products returned by one /api/products/batch/ request
+PRODUCT_BATCH_MAX = int(os.environ.get('PRODUCT_BATCH_MAX', 100))
+
+# Maximum number of orders accepted by the bulk status endpoint
+BULK_ORDER_STATUS_MAX = int(os.environ.get('BULK_ORDER_STATUS_MAX', 1000))
+
+# Orders fetched per server-side cursor round trip by the streaming order export
+ORDER_EXPORT_CHUNK_SIZE = int(os.environ.get('ORDER_EXPORT_CHUNK_SIZE', 2000))
+
+# Seconds a user's unread notification count may be served from cache
+UNREAD_COUNT_CACHE_TIMEOUT = int(os.environ.get('UNREAD_COUNT_CACHE_TIMEOUT', 60))
+
+# Per-request instrumentation (soya_project.middleware.InstrumentationMiddleware)
+INSTRUMENTATION_SLOW_REQUEST_MS = int(os.environ.get('INSTRUMENTATION_SLOW_REQUEST_MS', 500))
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(os.environ.get('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5))
+# Server-Timing shows every client the query count and database time; keep it to development
+INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', 'False').lower() == 'true'
+
+# Prometheus metrics: per-process snapshots are written here and merged on scrape
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, '.metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# /metrics requires "Authorization: Bearer <token>"; with no token it is only served under DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Seconds StatelessJWTAuthentication may trust a cached account; saving or
+# deleting a user drops it as soon as the change commits
+AUTH_STATE_CACHE_TIMEOUT = int(os.environ.get('AUTH_STATE_CACHE_TIMEOUT', 30))
+
+# Refresh-token revocation (soya_store.revocation): seconds between picking
+# up other processes' revocations, seconds between full filter rebuilds (done
+# in a background thread; they only drop expired entries), and the filter's
+# false positive rate (each false positive costs one query)
+REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 1))
+REVOCATION_REBUILD_INTERVAL = int(os.environ.get('REVOCATION_REBUILD_INTERVAL', 6 * 60 * 60))
+REVOCATION_FALSE_POSITIVE_RATE = float(os.environ.get('REVOCATION_FALSE_POSITIVE_RATE', 0.001))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=2),  # Short-lived access token
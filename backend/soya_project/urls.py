@@ -1,10 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-    TokenVerifyView,
-)
-from soya_store.auth import CustomTokenObtainPairView
+from rest_framework_simplejwt.views import TokenVerifyView
+from soya_store.auth import CustomTokenObtainPairView, CustomTokenRefreshView
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,8 +13,11 @@ urlpatterns = [
     
     # JWT Authentication endpoints
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
+    
     # Documentation removed temporarily
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Product, Order, Notification
+from .models import User, Product, Order, OrderItem, Notification
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -13,9 +13,15 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category', 'is_featured', 'is_best_seller', 'is_on_sale')
     search_fields = ('name', 'description')
 
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ('product',)
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'total', 'created_at')
+    inlines = [OrderItemInline]
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'user__email')
 
@@ -1,7 +1,15 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+from datetime import datetime, timezone
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 import logging
 
+from . import revocation
+from .authentication import account_state
+
 # Setup logger
 logger = logging.getLogger('django.security')
 
@@ -41,4 +49,46 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     """
     Custom token view using the custom serializer
     """
-    serializer_class = CustomTokenObtainPairSerializer
\ No newline at end of file
+    serializer_class = CustomTokenObtainPairSerializer
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that enforces BLACKLIST_AFTER_ROTATION against
+    soya_store.revocation instead of the token_blacklist app. Unrevoked
+    tokens, the common case, are answered from memory; the only write is
+    revoking the token being rotated.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        jti = refresh[api_settings.JTI_CLAIM]
+        if revocation.is_revoked(jti):
+            raise InvalidToken(_("Token is blacklisted"))
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None:
+            state = account_state(user_id)
+            if state is None or not state['is_active']:
+                raise AuthenticationFailed(_("No active account found for the given token."), code="no_active_account")
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                expires_at = datetime.fromtimestamp(refresh['exp'], tz=timezone.utc)
+                # Losing the race to revoke means another request already rotated it
+                if not revocation.revoke(jti, expires_at):
+                    raise InvalidToken(_("Token is blacklisted"))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    Token refresh view using the revocation-aware serializer
+    """
+    serializer_class = CustomTokenRefreshSerializer
@@ -0,0 +1,70 @@
+"""
+JWT authentication without a per-request user query.
+
+``StatelessJWTAuthentication`` builds the user from the token's user ID and a
+cached copy of the account: its ``username`` and ``email`` and the flags
+that can change during a token's lifetime (active, admin, staff and
+superuser). Identity never comes from token claims, so a new username or
+email is picked up like any other change. The copy is cached for
+``AUTH_STATE_CACHE_TIMEOUT`` seconds and dropped once a save or delete of
+the user commits, so a deactivation or demotion applies at once.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+AUTH_STATE_CACHE_TIMEOUT = getattr(settings, 'AUTH_STATE_CACHE_TIMEOUT', 30)
+
+# Loaded from the cached account; every other field is deferred until first accessed
+STATE_FIELDS = ('username', 'email', 'is_active', 'is_admin', 'is_staff', 'is_superuser')
+
+# Cached in place of the account for users that no longer exist
+MISSING = 'missing'
+
+
+def state_key(user_id):
+    return f'auth:account:{user_id}'
+
+
+def account_state(user_id):
+    """Return the user's ``STATE_FIELDS`` as a dict (None if the user is gone), cached"""
+    state = cache.get(state_key(user_id))
+    if state is None:
+        state = User.objects.filter(pk=user_id).values(*STATE_FIELDS).first() or MISSING
+        cache.set(state_key(user_id), state, AUTH_STATE_CACHE_TIMEOUT)
+    return None if state == MISSING else state
+
+
+def forget_account_state(user_id):
+    cache.delete(state_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Drop-in replacement for simplejwt's JWTAuthentication that builds
+    ``request.user`` from the cached account instead of loading the user row.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        state = account_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        loaded = {api_settings.USER_ID_FIELD: user_id, **state}
+        # from_db marks the instance as loaded from the database, so the
+        # fields not given here are deferred rather than left at defaults.
+        # It expects the values in model field order.
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+        return User.from_db(router.db_for_read(User), field_names, [loaded[name] for name in field_names])
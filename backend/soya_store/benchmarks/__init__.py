@@ -0,0 +1,29 @@
+"""
+Benchmark suite for soya_store.
+
+Each module in this package is one benchmark exposing ``add_arguments(parser)``
+and ``run(options, stdout)``; ``run`` returns a JSON-serialisable report with a
+``failures`` list. Run them with ``python manage.py benchmark <name>``.
+"""
+import importlib
+
+BENCHMARKS = {
+    'queries': 'soya_store.benchmarks.queries',
+    'stock': 'soya_store.benchmarks.stock',
+    'middleware': 'soya_store.benchmarks.middleware',
+    'login_flood': 'soya_store.benchmarks.login_flood',
+    'throttle': 'soya_store.benchmarks.throttle',
+    'cache_sharing': 'soya_store.benchmarks.cache_sharing',
+    'serializer': 'soya_store.benchmarks.serializer',
+    'json_codec': 'soya_store.benchmarks.json_codec',
+    'endpoints': 'soya_store.benchmarks.endpoints',
+    'auth': 'soya_store.benchmarks.auth',
+    'revocation': 'soya_store.benchmarks.revocation',
+    'signup': 'soya_store.benchmarks.signup',
+    'hashing': 'soya_store.benchmarks.hashing',
+}
+
+
+def load(name):
+    """Import and return the benchmark module registered as ``name``"""
+    return importlib.import_module(BENCHMARKS[name])
@@ -0,0 +1,54 @@
+"""
+Measure JWT authentication overhead per request.
+
+Authenticates the same access token with simplejwt's JWTAuthentication and
+with StatelessJWTAuthentication, and records the time per call and the
+queries per call. Fails if the stateless path queries the database once its
+account-state cache is warm.
+"""
+import uuid
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from soya_store.auth import CustomTokenObtainPairSerializer
+from soya_store.authentication import StatelessJWTAuthentication
+from soya_store.models import User
+from .utils import Rollback, summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=5000)
+
+
+def _measure(authentication, request, repeat):
+    authentication.authenticate(request)  # Warm caches
+    with CaptureQueriesContext(connection) as captured:
+        timings = time_calls(lambda: authentication.authenticate(request), repeat)
+    return {**summarize(timings), 'queries_per_call': round(len(captured) / repeat, 3)}
+
+
+def run(options, stdout):
+    report = {'authentication': {}, 'failures': []}
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user(username=f'bench-auth-{uuid.uuid4().hex[:8]}',
+                                            email=f'bench-auth-{uuid.uuid4().hex[:8]}@example.com',
+                                            password=uuid.uuid4().hex)
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            request = Request(RequestFactory().get('/api/orders/my/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+            for name, authentication in (('simplejwt', JWTAuthentication()), ('stateless', StatelessJWTAuthentication())):
+                result = _measure(authentication, request, options['repeat'])
+                report['authentication'][name] = result
+                stdout.write(f"  {name}: p50 {result['p50_ms'] * 1000:.1f}us, {result['queries_per_call']} queries per call")
+            raise Rollback
+    except Rollback:
+        pass
+
+    if report['authentication'].get('stateless', {}).get('queries_per_call'):
+        report['failures'].append('stateless authentication queried the database with a warm cache')
+    return report
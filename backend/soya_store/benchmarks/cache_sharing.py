@@ -0,0 +1,80 @@
+"""
+Prove cache counters and throttles are shared across worker processes.
+
+Spawns separate Python processes that each set up Django and then increment
+one counter and spend requests against one throttle key. The counter must
+equal the sum of all increments, and the throttle must admit no more than its
+limit across all processes together. A value written by the parent must also
+be visible to every child.
+"""
+import multiprocessing
+import os
+import uuid
+
+
+def add_arguments(parser):
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--increments', type=int, default=500, help='Counter increments per process')
+    parser.add_argument('--limit', type=int, default=50, help='Throttle limit shared by all processes')
+
+
+def _worker(args):
+    """Runs in a child process"""
+    tag, increments, limit = args
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'soya_project.settings')
+    import django
+    django.setup()
+
+    from types import SimpleNamespace
+    from django.core.cache import cache
+    from django.test import RequestFactory
+    from soya_store.throttling import CounterUserRateThrottle, incr_counter
+
+    for _ in range(increments):
+        incr_counter(f'bench:{tag}:counter', 600)
+
+    throttle_class = type('BenchThrottle', (CounterUserRateThrottle,), {'rate': f'{limit}/hour'})
+    request = RequestFactory().get('/')
+    request.user = SimpleNamespace(is_authenticated=True, pk=f'bench-{tag}')
+    admitted = sum(throttle_class().allow_request(request, None) for _ in range(limit))
+
+    return {'pid': os.getpid(), 'admitted': admitted, 'seen': cache.get(f'bench:{tag}:marker')}
+
+
+def run(options, stdout):
+    from django.conf import settings
+    from django.core.cache import cache, caches
+
+    tag = uuid.uuid4().hex[:12]
+    cache.set(f'bench:{tag}:marker', tag, 600)
+
+    context = multiprocessing.get_context('spawn')
+    stdout.write(f"Spawning {options['processes']} processes...")
+    with context.Pool(options['processes']) as pool:
+        results = pool.map(_worker, [(tag, options['increments'], options['limit'])] * options['processes'])
+
+    counter = cache.get(f'bench:{tag}:counter')
+    expected = options['processes'] * options['increments']
+    admitted = sum(result['admitted'] for result in results)
+
+    failures = []
+    if len({result['pid'] for result in results}) < 2 and options['processes'] > 1:
+        failures.append('workers did not run in separate processes')
+    if counter != expected:
+        failures.append(f'shared counter is {counter}, expected {expected}')
+    if admitted > options['limit']:
+        failures.append(f"throttle admitted {admitted} requests across processes, limit {options['limit']}")
+    blind = [result['pid'] for result in results if result['seen'] != tag]
+    if blind:
+        failures.append(f'processes {blind} could not see a value written by the parent')
+
+    cache.delete_many([f'bench:{tag}:counter', f'bench:{tag}:marker'])
+    return {
+        'backends': {alias: type(caches[alias]).__name__ for alias in settings.CACHES},
+        'processes': results,
+        'counter': counter,
+        'expected_counter': expected,
+        'throttle_admitted': admitted,
+        'throttle_limit': options['limit'],
+        'failures': failures,
+    }
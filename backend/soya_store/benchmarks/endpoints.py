@@ -0,0 +1,308 @@
+"""
+Time every named route in soya_store/urls.py through the test client.
+
+Seeds a synthetic dataset (or uses the current database with ``--existing``)
+plus a regular user and an admin, then requests each route ``--repeat``
+times with JWT authentication. The report records p50/p95 latency and query
+counts per route. The first request is reported separately as ``cold_ms``,
+because it fills the catalog cache. With ``--baseline``, a previous report
+is compared route by route, and any p95 that grows by more than
+``--max-regression`` is reported as a failure. Everything is rolled back
+afterwards unless ``--keep`` is given.
+
+The run uses its own in-memory shared cache behind the usual tiered cache,
+so catalog entries built from the seeded rows never reach the cache live
+processes read, and vanish with the rollback.
+"""
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from soya_store import catalog_cache, notifications, synthetic, throttling, urls
+from soya_store.models import User, Product, Order, Notification
+from .utils import Rollback, summarize
+
+PASSWORD = 'Bench-password-1!'
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--notifications', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--existing', action='store_true',
+                        help='Benchmark against the data already in the database instead of seeding')
+    parser.add_argument('--repeat', type=int, default=50, help='Requests per route')
+    parser.add_argument('--routes', nargs='*', help='Only benchmark these URL names')
+    parser.add_argument('--throttled', action='store_true',
+                        help='Keep rate limits on (by default they are bypassed so every request is served)')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='Allowed p95 growth over the baseline, as a fraction')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the seeded data instead of rolling it back')
+
+
+class Case:
+    """
+    How to request one route. ``kwargs``, ``query`` and ``data`` may be
+    callables taking ``(fixtures, iteration)``.
+    """
+    def __init__(self, method='get', auth=None, kwargs=None, query=None, data=None, expect=(200,)):
+        self.method = method
+        self.auth = auth
+        self.kwargs = kwargs
+        self.query = query
+        self.data = data
+        self.expect = expect
+
+    @staticmethod
+    def _resolve(value, fixtures, iteration):
+        return value(fixtures, iteration) if callable(value) else value
+
+    def request(self, client, name, fixtures, iteration):
+        path = reverse(name, kwargs=self._resolve(self.kwargs, fixtures, iteration))
+        headers = {}
+        if self.auth:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {fixtures.tokens[self.auth]}'
+        if self.method == 'get':
+            return path, client.get(path, self._resolve(self.query, fixtures, iteration), **headers)
+        return path, client.generic(
+            self.method.upper(), path, json.dumps(self._resolve(self.data, fixtures, iteration)),
+            content_type='application/json', **headers,
+        )
+
+
+def _status(iteration):
+    return 'processing' if iteration % 2 else 'shipped'
+
+
+def _reset_data(fixtures, iteration):
+    user = User.objects.get(pk=fixtures.user.pk)
+    return {
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+        'password': PASSWORD,
+        'password_confirm': PASSWORD,
+    }
+
+
+# One case per URL name; explicit paths in urls.py share the router's case
+CASES = {
+    'api-root': Case(),
+    'login': Case('post', data=lambda f, i: {'username': f.user.username, 'password': PASSWORD}),
+    'register': Case('post', expect=(201,), data=lambda f, i: {
+        'username': f'bench-{uuid.uuid4().hex[:12]}', 'email': f'bench-{uuid.uuid4().hex[:12]}@example.com',
+        'password': PASSWORD, 'name': 'Bench Signup',
+    }),
+    'password-reset-request': Case('post', data=lambda f, i: {'email': f.user.email}),
+    'password-reset-confirm': Case('post', data=_reset_data),
+    'user-list': Case(auth='admin'),
+    'user-detail': Case(auth='admin', kwargs=lambda f, i: {'pk': f.user.pk}),
+    'user-me': Case(auth='user'),
+    'user-orders': Case(auth='user', kwargs=lambda f, i: {'pk': f.user.pk}),
+    'product-list': Case(),
+    'product-detail': Case(kwargs=lambda f, i: {'pk': f.product_ids[i % len(f.product_ids)]}),
+    'product-featured': Case(),
+    'product-bestsellers': Case(),
+    'product-by-category': Case(query={'category': synthetic.CATEGORIES[0]}),
+    'product-search': Case(query={'q': 'heirloom soy'}),
+    'product-batch': Case(query=lambda f, i: {'ids': ','.join(map(str, f.product_ids[:30]))}),
+    'product-catalog-cache-stats': Case(auth='admin'),
+    'order-list': Case(auth='admin'),
+    'order-detail': Case(auth='admin', kwargs=lambda f, i: {'pk': f.order_ids[i % len(f.order_ids)]}),
+    'order-my-orders': Case(auth='user'),
+    'order-update-status': Case('post', auth='admin', kwargs=lambda f, i: {'pk': f.order_ids[0]},
+                                data=lambda f, i: {'status': _status(i)}),
+    'order-bulk-update-order-status': Case('post', auth='admin',
+                                           data=lambda f, i: {'ids': f.order_ids, 'status': _status(i)}),
+    'order-export-orders': Case(auth='admin', query=lambda f, i: {
+        'output': 'ndjson', 'created_after': (timezone.now() - timedelta(days=1)).isoformat(),
+    }),
+    'notification-list': Case(auth='user'),
+    'notification-detail': Case(auth='user', kwargs=lambda f, i: {'pk': f.notification_ids[i % len(f.notification_ids)]}),
+    'notification-mark-read': Case('post', auth='user', data=lambda f, i: {'ids': f.notification_ids}),
+    'notification-mark-all-notifications-read': Case('post', auth='user'),
+    'notification-unread-count': Case(auth='user'),
+}
+CASES.update({
+    'featured-products': CASES['product-featured'],
+    'bestseller-products': CASES['product-bestsellers'],
+    'products-by-category': CASES['product-by-category'],
+    'search-products': CASES['product-search'],
+    'my-orders': CASES['order-my-orders'],
+    'update-order-status': Case('patch', auth='admin', kwargs=lambda f, i: {'pk': f.order_ids[0]},
+                                data=lambda f, i: {'status': _status(i)}),
+    'mark-notifications-read': CASES['notification-mark-read'],
+    'unread-notifications-count': CASES['notification-unread-count'],
+})
+
+
+def route_names(patterns=None):
+    """Every URL name in soya_store/urls.py, in declaration order"""
+    names = []
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names.extend(route_names(pattern.url_patterns))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.append(pattern.name)
+    return list(dict.fromkeys(names))
+
+
+def _fixtures(rng):
+    """A regular user with orders and notifications, an admin, and JWTs for both"""
+    user = User.objects.create_user(username=f'bench-user-{uuid.uuid4().hex[:8]}', password=PASSWORD,
+                                    email=f'bench-{uuid.uuid4().hex[:8]}@example.com', name='Bench User')
+    admin = User.objects.create_user(username=f'bench-admin-{uuid.uuid4().hex[:8]}', password=PASSWORD,
+                                     email=f'bench-admin-{uuid.uuid4().hex[:8]}@example.com', name='Bench Admin',
+                                     is_admin=True, is_staff=True)
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:1000])
+    catalog = list(Product.objects.filter(pk__in=product_ids[:200]).values_list('id', 'name', 'price'))
+    if catalog:
+        synthetic.generate_orders(50, [user.pk], catalog, rng)
+    notifications.notify_many([
+        Notification(user_id=user.pk, title='Bench', message=f'Notification {n}') for n in range(50)
+    ])
+    return SimpleNamespace(
+        user=user,
+        admin=admin,
+        product_ids=product_ids,
+        order_ids=list(Order.objects.filter(user=user).values_list('id', flat=True)[:50]),
+        notification_ids=list(Notification.objects.filter(user=user).values_list('id', flat=True)[:50]),
+        tokens={
+            'user': str(RefreshToken.for_user(user).access_token),
+            'admin': str(RefreshToken.for_user(admin).access_token),
+        },
+    )
+
+
+def _isolated_caches():
+    """
+    ``settings.CACHES`` with the shared tier swapped for a private in-memory
+    cache. A default cache without a shared tier is replaced outright.
+    """
+    private = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'bench-endpoints-{uuid.uuid4().hex}',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+    default = settings.CACHES['default']
+    options = default.get('OPTIONS', {})
+    if 'SHARED' not in options:
+        return {'default': private}
+    return {'default': {**default, 'OPTIONS': {**options, 'SHARED': 'shared'}}, 'shared': private}
+
+
+def _measure(client, name, case, fixtures, repeat):
+    timings = []
+    queries = []
+    statuses = set()
+    path = None
+    for iteration in range(repeat + 1):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            path, response = case.request(client, name, fixtures, iteration)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+        statuses.add(response.status_code)
+        timings.append(elapsed)
+        queries.append(len(captured))
+
+    result = {
+        'method': case.method.upper(),
+        'path': path,
+        'statuses': sorted(statuses),
+        'cold_ms': round(timings[0], 3),
+        'cold_queries': queries[0],
+        **summarize(timings[1:]),
+        'queries_p50': sorted(queries[1:])[len(queries[1:]) // 2] if repeat else None,
+        'queries_max': max(queries[1:]) if repeat else None,
+    }
+    unexpected = statuses - set(case.expect)
+    return result, [f'{name}: unexpected status {sorted(unexpected)}'] if unexpected else []
+
+
+def _compare(report, baseline_path, max_regression):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh).get('routes', {})
+    comparison = {}
+    failures = []
+    for name, result in report['routes'].items():
+        before = baseline.get(name, {}).get('p95_ms')
+        if not before or result.get('p95_ms') is None:
+            continue
+        change = (result['p95_ms'] - before) / before
+        comparison[name] = {'baseline_p95_ms': before, 'p95_ms': result['p95_ms'], 'change': round(change, 3)}
+        if change > max_regression:
+            failures.append(f"{name}: p95 {result['p95_ms']}ms is {change:.0%} slower than the baseline's {before}ms")
+    return comparison, failures
+
+
+def run(options, stdout):
+    names = route_names()
+    if options['routes']:
+        names = [name for name in names if name in options['routes']]
+    report = {'routes': {}, 'skipped': [name for name in names if name not in CASES], 'failures': []}
+
+    throttles = mock.patch.object(throttling.SlidingWindowRateThrottle, 'allow_request', lambda *args: True)
+    try:
+        with transaction.atomic(), override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                                                     CACHES=_isolated_caches()):
+            rng = random.Random(options['seed'])
+            if not options['existing']:
+                stdout.write('Seeding synthetic data...')
+                report['dataset'] = {key: options[key] for key in ('users', 'products', 'orders', 'notifications', 'seed')}
+                synthetic.generate_dataset(
+                    users=options['users'], products=options['products'], orders=options['orders'],
+                    notifications=options['notifications'], seed=options['seed'], prefix=f"bench{options['seed']}",
+                )
+            fixtures = _fixtures(rng)
+            if not fixtures.product_ids or not fixtures.order_ids:
+                raise Rollback('no products to benchmark against; seed data or drop --existing')
+
+            client = Client()
+            if not options['throttled']:
+                throttles.start()
+            try:
+                for name in names:
+                    if name not in CASES:
+                        continue
+                    result, failures = _measure(client, name, CASES[name], fixtures, options['repeat'])
+                    report['routes'][name] = result
+                    report['failures'].extend(failures)
+                    stdout.write(f"  {name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, "
+                                 f"{result['queries_p50']} queries")
+            finally:
+                if not options['throttled']:
+                    throttles.stop()
+
+            if not options['keep']:
+                raise Rollback
+    except Rollback as exc:
+        if exc.args:
+            report['failures'].append(exc.args[0])
+    else:
+        # The kept rows were cached privately; drop what live processes hold
+        catalog_cache.invalidate_catalog()
+
+    if options['baseline']:
+        report['comparison'], failures = _compare(report, options['baseline'], options['max_regression'])
+        report['failures'].extend(failures)
+    return report
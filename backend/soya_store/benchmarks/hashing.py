@@ -0,0 +1,101 @@
+"""
+Measure login throughput under concurrent load, hashing inline and pooled.
+
+Creates a user, then runs ``--threads`` threads calling ``authenticate()``
+with the right password for ``--seconds``. The run is repeated with hashes
+on the request threads and with the hashing pool of ``--workers``
+processes. Each phase reports logins per second, logins per second per core
+in use, latency percentiles, and logins refused because the pool was full.
+The user is committed, since the threads use their own connections, and is
+deleted afterwards. Fails if a login is refused while the pool's pending
+limit is at least the number of threads.
+"""
+import os
+import threading
+import time
+import uuid
+
+from django.contrib.auth import authenticate
+from django.db import connection
+
+from soya_store import hashing_pool
+from soya_store.models import User
+from .utils import summarize
+
+PASSWORD = 'Bench-password-1!'
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each phase')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Hashing pool processes')
+    parser.add_argument('--max-pending', type=int, default=hashing_pool.PASSWORD_HASHING_MAX_PENDING)
+
+
+def _load(username, threads, seconds):
+    lock = threading.Lock()
+    timings = []
+    counts = {'refused': 0, 'failed': 0}
+    deadline = time.perf_counter() + seconds
+
+    def login():
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    user = authenticate(username=username, password=PASSWORD)
+                except hashing_pool.HashingPoolBusy:
+                    outcome = 'refused'
+                else:
+                    outcome = None if user is not None else 'failed'
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    if outcome:
+                        counts[outcome] += 1
+                    else:
+                        timings.append(elapsed)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=login) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return timings, counts
+
+
+def run(options, stdout):
+    report = {'cpus': os.cpu_count(), 'threads': options['threads'], 'phases': {}, 'failures': []}
+    username = f'bench-hashing-{uuid.uuid4().hex[:8]}'
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password=PASSWORD)
+    original = hashing_pool.pool
+    phases = {
+        'inline': (hashing_pool.HashingPool(0, 0), options['threads']),
+        'pooled': (hashing_pool.HashingPool(options['workers'], options['max_pending']), options['workers']),
+    }
+    try:
+        for name, (pool, concurrency) in phases.items():
+            hashing_pool.pool = pool
+            authenticate(username=username, password=PASSWORD)  # Start the pool's workers
+            stdout.write(f"{name}: {options['threads']} threads for {options['seconds']}s...")
+            timings, counts = _load(username, options['threads'], options['seconds'])
+            pool.shutdown()
+            rate = len(timings) / options['seconds']
+            cores = min(concurrency, os.cpu_count())
+            report['phases'][name] = {
+                **summarize(timings),
+                'logins_per_second': round(rate, 1),
+                'logins_per_second_per_core': round(rate / cores, 1),
+                **counts,
+            }
+            stdout.write(f"  {rate:.1f} logins/s, {rate / cores:.1f} per core, "
+                         f"{counts['refused']} refused, {counts['failed']} failed")
+            if counts['failed']:
+                report['failures'].append(f"{name}: {counts['failed']} logins failed with the right password")
+            if counts['refused'] and options['max_pending'] >= options['threads']:
+                report['failures'].append(f"{name}: {counts['refused']} logins refused with room in the pool")
+    finally:
+        hashing_pool.pool = original
+        user.delete()
+    return report
@@ -0,0 +1,80 @@
+"""
+Compare the orjson-backed renderer and parser with DRF's stdlib ones.
+
+Builds ``--orders`` in-memory orders with ``--items`` line items each, then
+times rendering the serialized list and parsing it back with both codecs.
+Nothing touches the database. Fails if the two renderers disagree on the
+bytes or the two parsers on the decoded data.
+"""
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from soya_store import synthetic
+from soya_store.models import Order
+from soya_store.parsers import FastJSONParser
+from soya_store.renderers import FastJSONRenderer, orjson
+from soya_store.serializers import OrderSerializer
+from .utils import summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=5, help='Line items per order')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def build_orders(count, items, rng):
+    now = timezone.now()
+    orders = []
+    for order_id in range(1, count + 1):
+        lines = [
+            {
+                'productId': rng.randrange(1, 10000),
+                'name': f'{rng.choice(synthetic.CATEGORIES)} – lot {rng.randrange(1000)}',
+                'quantity': rng.randint(1, 5),
+                'price': str(Decimal(rng.randrange(100, 10000)) / 100),
+            }
+            for _ in range(items)
+        ]
+        orders.append(Order(
+            id=order_id,
+            user_id=rng.randrange(1, 1000),
+            status='pending',
+            total=sum(Decimal(line['price']) * line['quantity'] for line in lines),
+            items_json=lines,
+            shipping_address_json={'street': f'{order_id} Main St', 'city': 'Springfield', 'zip': '12345'},
+            payment_method='card',
+            created_at=now - timedelta(minutes=order_id, microseconds=order_id),
+        ))
+    return orders
+
+
+def run(options, stdout):
+    if orjson is None:
+        return {'failures': ['orjson is not installed; both codecs are the stdlib one']}
+
+    data = OrderSerializer(build_orders(options['orders'], options['items'], random.Random(options['seed'])), many=True).data
+    report = {'orders': options['orders'], 'render': {}, 'parse': {}, 'failures': []}
+
+    stdlib_body = JSONRenderer().render(data)
+    fast_body = FastJSONRenderer().render(data)
+    report['body_bytes'] = len(stdlib_body)
+    if fast_body != stdlib_body:
+        report['failures'].append('FastJSONRenderer output differs from JSONRenderer')
+
+    for name, renderer, parser in (('stdlib', JSONRenderer(), JSONParser()), ('orjson', FastJSONRenderer(), FastJSONParser())):
+        report['render'][name] = summarize(time_calls(lambda: renderer.render(data), options['repeat']))
+        report['parse'][name] = summarize(time_calls(lambda: parser.parse(io.BytesIO(stdlib_body)), options['repeat']))
+        stdout.write(f"  {name}: render p50 {report['render'][name]['p50_ms']}ms, "
+                     f"parse p50 {report['parse'][name]['p50_ms']}ms")
+
+    if FastJSONParser().parse(io.BytesIO(stdlib_body)) != JSONParser().parse(io.BytesIO(stdlib_body)):
+        report['failures'].append('FastJSONParser result differs from JSONParser')
+    return report
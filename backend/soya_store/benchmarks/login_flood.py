@@ -0,0 +1,91 @@
+"""
+Check that a failed-login flood does not starve legitimate requests.
+
+Measures legitimate throughput on a catalog endpoint alone, then again while
+attacker threads hammer ``/api/auth/login/`` with bad credentials (each from
+its own address so throttling does not cut them off). Fails if throughput
+under attack drops below ``--min-ratio`` of the baseline or if a failed login
+holds its worker for ``--max-failure-ms`` or longer.
+"""
+import threading
+import time
+import uuid
+
+from django.db import connection
+from django.test import Client
+
+from .utils import summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--attackers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each phase')
+    parser.add_argument('--path', default='/api/products/featured/', help='Legitimate endpoint to measure')
+    parser.add_argument('--min-ratio', type=float, default=0.5)
+    parser.add_argument('--max-failure-ms', type=float, default=1000.0)
+
+
+def _legitimate_load(path, seconds):
+    client = Client()
+    served = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.get(path)
+        served += 1
+    connection.close()
+    return served / seconds
+
+
+def run(options, stdout):
+    stdout.write(f"Baseline: {options['path']} for {options['seconds']}s...")
+    baseline = _legitimate_load(options['path'], options['seconds'])
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    failure_timings = []
+
+    def attacker(number):
+        client = Client()
+        attempt = 0
+        try:
+            while not stop.is_set():
+                attempt += 1
+                started = time.perf_counter()
+                client.post(
+                    '/api/auth/login/',
+                    {'username': f'attacker-{uuid.uuid4().hex[:8]}', 'password': 'wrong-password-1'},
+                    content_type='application/json',
+                    REMOTE_ADDR=f'10.{number % 256}.{attempt // 256 % 256}.{attempt % 256}',
+                )
+                with lock:
+                    failure_timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+
+    stdout.write(f"Under attack: {options['attackers']} threads sending failed logins...")
+    threads = [threading.Thread(target=attacker, args=(n,)) for n in range(options['attackers'])]
+    for thread in threads:
+        thread.start()
+    try:
+        under_attack = _legitimate_load(options['path'], options['seconds'])
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    ratio = under_attack / baseline if baseline else 0
+    failed_logins = summarize(failure_timings)
+    failures = []
+    if ratio < options['min_ratio']:
+        failures.append(f'legitimate throughput fell to {ratio:.0%} of baseline')
+    if failure_timings and failed_logins['p50_ms'] >= options['max_failure_ms']:
+        failures.append(f"failed logins hold a worker for {failed_logins['p50_ms']}ms")
+
+    return {
+        'baseline_rps': round(baseline, 1),
+        'under_attack_rps': round(under_attack, 1),
+        'throughput_ratio': round(ratio, 3),
+        'failed_logins': failed_logins,
+        'failed_logins_per_second': round(len(failure_timings) / options['seconds'], 1),
+        'failures': failures,
+    }
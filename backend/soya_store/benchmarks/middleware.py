@@ -0,0 +1,63 @@
+"""
+Measure SecurityMiddleware's per-request scanning overhead.
+
+Runs typical requests and a 1 MB JSON body through the middleware with a
+no-op view and reports the time spent per request, with the configured scan
+limit (under which the 1 MB body is rejected unscanned, unless
+``SECURITY_SCAN_OVERSIZE`` is ``'truncate'``) and with scanning unbounded.
+"""
+import json
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from soya_project.middleware import SecurityMiddleware
+from .utils import summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--large-repeat', type=int, default=50,
+                        help='Iterations for the 1 MB body scenarios')
+
+
+def _scenarios():
+    factory = RequestFactory()
+    order = {
+        'user': 1,
+        'total': '43.98',
+        'items': [{'productId': 1, 'name': 'Organic Soybean Seeds - 2lb Bag', 'price': '24.99', 'quantity': 1},
+                  {'productId': 2, 'name': 'Heirloom Black Soybean Seeds - 1lb Bag', 'price': '18.99', 'quantity': 1}],
+        'shipping_address': {'street': '1 Main St', 'city': 'Springfield', 'state': 'IL', 'zip': '62701'},
+        'payment_method': 'Credit Card',
+    }
+    large = json.dumps({'items': ['organic soybean seeds ' * 8] * (1024 * 1024 // 180)})
+    return {
+        'product browsing (exempt)': lambda: factory.get('/api/products/', {'cursor': 'cD0yMA=='}),
+        'order list with query': lambda: factory.get('/api/orders/', {'page_size': '50', 'status': 'pending'}),
+        'order create (1 KB JSON)': lambda: factory.post('/api/orders/', json.dumps(order), content_type='application/json'),
+        'import (1 MB JSON)': lambda: factory.post('/api/orders/', large, content_type='application/json'),
+    }
+
+
+def run(options, stdout):
+    middleware = SecurityMiddleware(lambda request: HttpResponse())
+    configured_limit = middleware.max_scan_bytes
+    report = {'scenarios': {}, 'failures': []}
+
+    for limit_name, limit in (('configured', configured_limit), ('unbounded', 0)):
+        middleware.max_scan_bytes = limit
+        for name, make_request in _scenarios().items():
+            repeat = options['large_repeat'] if '1 MB' in name else options['repeat']
+            requests = [make_request() for _ in range(repeat)]
+            for request in requests:
+                request.body  # read the stream up front so only scanning is timed
+            iterator = iter(requests)
+
+            samples = time_calls(lambda: middleware.scan_request(next(iterator)), repeat)
+            result = summarize(samples)
+            report['scenarios'][f'{name} [{limit_name} limit]'] = result
+            stdout.write(f"  {name} [{limit_name}]: p50 {result['p50_ms'] * 1000:.1f}us, p95 {result['p95_ms'] * 1000:.1f}us")
+
+    middleware.max_scan_bytes = configured_limit
+    return report
@@ -0,0 +1,116 @@
+"""
+Check that each endpoint's hot query uses an index scan and stays under a latency budget.
+
+Seeds large synthetic tables inside a transaction, runs ANALYZE so the planner
+sees realistic statistics, then runs ``EXPLAIN (ANALYZE, FORMAT JSON)`` for the
+query behind every catalog, order and notification endpoint. The seeded data
+is rolled back afterwards unless ``--keep`` is given.
+"""
+import json
+import random
+
+from django.db import connection, transaction
+
+from soya_store import synthetic
+from soya_store.models import Product, Order, Notification
+from .utils import Rollback
+
+INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--notifications', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--budget-ms', type=float, default=50.0,
+                        help='Maximum execution time allowed per query')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the seeded data instead of rolling it back')
+
+
+def endpoint_queries(user_id):
+    """The query each endpoint issues, as run by its view and paginator"""
+    return {
+        'product-list': Product.objects.order_by('id')[:21],
+        'featured-products': Product.objects.filter(is_featured=True),
+        'bestseller-products': Product.objects.filter(is_best_seller=True),
+        'products-by-category': Product.objects.filter(category=synthetic.CATEGORIES[0]),
+        'search-products': Product.objects.search('heirloom soy')[:20],
+        'order-list': Order.objects.order_by('-created_at', '-id')[:21],
+        'my-orders': Order.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:21],
+        'notification-list': Notification.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:21],
+        'unread-notifications-count': Notification.objects.filter(user_id=user_id, is_read=False).values('id'),
+    }
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _walk(child)
+
+
+def explain(queryset):
+    """Return ``(execution_ms, nodes)`` for ``queryset`` from EXPLAIN ANALYZE"""
+    result = json.loads(queryset.explain(format='json', analyze=True))[0]
+    nodes = [
+        {'type': node['Node Type'], 'relation': node.get('Relation Name'), 'index': node.get('Index Name')}
+        for node in _walk(result['Plan'])
+    ]
+    return result['Execution Time'], nodes
+
+
+def check(name, queryset, budget_ms):
+    execution_ms, nodes = explain(queryset)
+    index_nodes = [node for node in nodes if node['type'] in INDEX_NODES]
+    seq_scans = [node['relation'] for node in nodes if node['type'] == 'Seq Scan']
+
+    failures = []
+    if not index_nodes:
+        failures.append(f'{name}: no index scan in plan')
+    if seq_scans:
+        failures.append(f"{name}: sequential scan on {', '.join(seq_scans)}")
+    if execution_ms > budget_ms:
+        failures.append(f'{name}: {execution_ms:.2f}ms exceeds {budget_ms}ms budget')
+
+    return {
+        'execution_ms': round(execution_ms, 3),
+        'indexes': sorted({node['index'] for node in index_nodes if node['index']}),
+        'plan': [node['type'] for node in nodes],
+    }, failures
+
+
+def run(options, stdout):
+    if connection.vendor != 'postgresql':
+        return {'failures': [f'EXPLAIN checks require PostgreSQL, not {connection.vendor}']}
+
+    report = {'queries': {}, 'failures': []}
+    try:
+        with transaction.atomic():
+            stdout.write('Seeding synthetic data...')
+            rng = random.Random(options['seed'])
+            user_ids = synthetic.generate_users(options['users'], rng, prefix=f"bench{options['seed']}")
+            product_ids = synthetic.generate_products(options['products'], rng)
+            catalog = list(
+                Product.objects.filter(pk__in=product_ids[:5000]).order_by('id').values_list('id', 'name', 'price')
+            )
+            synthetic.generate_orders(options['orders'], user_ids, catalog, rng)
+            synthetic.generate_notifications(options['notifications'], user_ids, rng)
+
+            with connection.cursor() as cursor:
+                for model in (Product, Order, Notification):
+                    cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+            user_id = user_ids[len(user_ids) // 2]
+            for name, queryset in endpoint_queries(user_id).items():
+                result, failures = check(name, queryset, options['budget_ms'])
+                report['queries'][name] = result
+                report['failures'].extend(failures)
+                stdout.write(f"  {name}: {result['execution_ms']}ms via {', '.join(result['indexes']) or 'no index'}")
+
+            if not options['keep']:
+                raise Rollback
+    except Rollback:
+        pass
+    return report
@@ -0,0 +1,88 @@
+"""
+Measure refresh-token revocation checks against a large revocation table.
+
+Seeds ``--tokens`` revoked tokens, rebuilds a fresh revocation filter, then
+times ``is_revoked`` for unknown token IDs (the common case on refresh) and
+for revoked ones. The report includes the rebuild time, the filter's size
+and its observed false positive rate. Fails if checking unknown tokens
+queries the database more often than the false positives explain.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from soya_store import revocation
+from soya_store.models import RevokedToken
+from .utils import Rollback, summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--tokens', type=int, default=1000000, help='Revoked tokens to seed')
+    parser.add_argument('--repeat', type=int, default=20000, help='Checks per measurement')
+    parser.add_argument('--batch-size', type=int, default=10000)
+
+
+def _seed(count, batch_size):
+    expires_at = timezone.now() + timedelta(days=14)
+    jtis = []
+    for start in range(0, count, batch_size):
+        batch = [uuid.uuid4().hex for _ in range(min(batch_size, count - start))]
+        RevokedToken.objects.bulk_create([RevokedToken(jti=jti, expires_at=expires_at) for jti in batch])
+        jtis.extend(batch[:10])
+    return jtis
+
+
+def _measure(jtis, repeat):
+    with CaptureQueriesContext(connection) as captured:
+        timings = time_calls(lambda it=iter(jtis): revocation.is_revoked(next(it)), repeat)
+    return {**summarize(timings), 'queries_per_call': round(len(captured) / repeat, 4)}
+
+
+def run(options, stdout):
+    report = {'failures': []}
+    original = revocation.revocation_filter
+    try:
+        with transaction.atomic():
+            stdout.write(f"Seeding {options['tokens']} revoked tokens...")
+            revoked = _seed(options['tokens'], options['batch_size'])
+
+            revocation.revocation_filter = revocation.RevocationFilter()
+            started = time.perf_counter()
+            revocation.revocation_filter.rebuild()
+            bloom = revocation.revocation_filter.bloom
+            report['filter'] = {
+                'rebuild_s': round(time.perf_counter() - started, 3),
+                'tokens': bloom.count,
+                'bytes': len(bloom.bits),
+                'hashes': bloom.hashes,
+            }
+
+            unknown = [uuid.uuid4().hex for _ in range(options['repeat'])]
+            false_positives = sum(jti in bloom for jti in unknown)
+            report['filter']['false_positive_rate'] = round(false_positives / len(unknown), 5)
+            report['unknown'] = _measure(unknown, len(unknown))
+            report['revoked'] = _measure(revoked * (options['repeat'] // max(len(revoked), 1) + 1), options['repeat'])
+
+            stdout.write(f"  filter: {bloom.count} tokens in {len(bloom.bits) / 2 ** 20:.1f} MiB, "
+                         f"rebuilt in {report['filter']['rebuild_s']}s")
+            for name in ('unknown', 'revoked'):
+                result = report[name]
+                stdout.write(f"  {name}: p50 {result['p50_ms'] * 1000:.1f}us, {result['queries_per_call']} queries per call")
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        revocation.revocation_filter = original
+
+    if 'unknown' in report:
+        # Syncs with other processes add at most one query per sync interval
+        allowed = report['filter']['false_positive_rate'] + 0.01
+        if report['unknown']['queries_per_call'] > allowed:
+            report['failures'].append(
+                f"unknown tokens cost {report['unknown']['queries_per_call']} queries per check, expected at most {allowed:.4f}"
+            )
+    return report
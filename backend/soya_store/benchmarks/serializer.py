@@ -0,0 +1,56 @@
+"""
+Compare ProductSerializer with the ``.values()`` fast path used by catalog GETs.
+
+Seeds products inside a transaction and times fetching and serializing
+``--products`` of them both ways, including the query, since building model
+instances is part of what the fast path avoids. Fails if the two paths do not
+render byte-identical JSON.
+"""
+import random
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from soya_store import synthetic
+from soya_store.models import Product
+from soya_store.serializers import ProductSerializer, product_rows
+from .utils import Rollback, summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def run(options, stdout):
+    report = {'failures': []}
+    try:
+        with transaction.atomic():
+            stdout.write(f"Seeding {options['products']} products...")
+            product_ids = synthetic.generate_products(options['products'], random.Random(options['seed']))
+            queryset = Product.objects.filter(pk__in=product_ids).order_by('id')
+
+            def model_path():
+                return ProductSerializer(list(queryset), many=True).data
+
+            def rows_path():
+                return product_rows.many(product_rows.rows(queryset))
+
+            renderer = JSONRenderer()
+            if renderer.render(model_path()) != renderer.render(rows_path()):
+                report['failures'].append('fast path JSON differs from ProductSerializer output')
+
+            per_thousand = 1000 / max(options['products'], 1)
+            for name, func in (('serializer', model_path), ('rows', rows_path)):
+                timings = [ms * per_thousand for ms in time_calls(func, options['repeat'])]
+                report[name] = summarize(timings)
+                stdout.write(f"  {name}: p50 {report[name]['p50_ms']}ms per 1,000 products")
+
+            raise Rollback
+    except Rollback:
+        pass
+
+    if report.get('rows', {}).get('p50_ms'):
+        report['speedup'] = round(report['serializer']['p50_ms'] / report['rows']['p50_ms'], 2)
+    return report
@@ -0,0 +1,105 @@
+"""
+Measure the cost of a signup and of the password hash inside it.
+
+Times one PBKDF2 hash at the configured ``PASSWORD_PBKDF2_ITERATIONS`` and at
+each of ``--iterations``, to show what a different work factor would buy.
+Then posts ``--signups`` registrations to ``/api/auth/register/`` and
+records signups per second and the queries per signup, not counting
+savepoints. A duplicate username is also posted, to check its response and
+latency against a successful signup. Fails if a signup takes more than one
+query or if the duplicate's response changes.
+"""
+import json
+import time
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from soya_store import throttling
+from soya_store.serializers import RegistrationSerializer
+from .utils import Rollback, summarize, time_calls
+
+PASSWORD = 'Bench-password-1!'
+
+
+def add_arguments(parser):
+    parser.add_argument('--signups', type=int, default=50)
+    parser.add_argument('--hashes', type=int, default=10, help='Hashes timed per iteration count')
+    parser.add_argument('--iterations', type=int, nargs='*', default=[260000, 600000, 1000000],
+                        help='Other PBKDF2 iteration counts to time')
+
+
+def _signup_data():
+    name = uuid.uuid4().hex[:12]
+    return {'username': f'bench-{name}', 'email': f'bench-{name}@example.com', 'password': PASSWORD, 'name': 'Bench Signup'}
+
+
+def _data_queries(captured):
+    return [query for query in captured.captured_queries if 'SAVEPOINT' not in query['sql'].upper()]
+
+
+def _hashing(options):
+    hasher = PBKDF2PasswordHasher()
+    report = {}
+    for iterations in dict.fromkeys([settings.PASSWORD_PBKDF2_ITERATIONS, *options['iterations']]):
+        salt = hasher.salt()
+        timings = time_calls(lambda: hasher.encode(PASSWORD, salt, iterations), options['hashes'])
+        result = summarize(timings)
+        report[iterations] = {**result, 'hashes_per_second_per_core': round(1000 / result['mean_ms'], 1)}
+    return report
+
+
+def run(options, stdout):
+    report = {'iterations': settings.PASSWORD_PBKDF2_ITERATIONS, 'failures': []}
+    report['hashing'] = _hashing(options)
+    for iterations, result in report['hashing'].items():
+        stdout.write(f"  pbkdf2 x{iterations}: {result['mean_ms']}ms per hash, "
+                     f"{result['hashes_per_second_per_core']} per second per core")
+
+    client = Client()
+    path = reverse('register')
+    throttles = mock.patch.object(throttling.SlidingWindowRateThrottle, 'allow_request', lambda *args: True)
+    timings = []
+    queries = []
+    try:
+        with transaction.atomic(), throttles:
+            for _ in range(options['signups']):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.post(path, json.dumps(_signup_data()), content_type='application/json')
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 201:
+                    report['failures'].append(f'signup returned {response.status_code}: {response.content[:200]!r}')
+                    raise Rollback
+                queries.append(len(_data_queries(captured)))
+
+            duplicate = {**_signup_data(), 'username': json.loads(response.content)['username']}
+            started = time.perf_counter()
+            response = client.post(path, json.dumps(duplicate), content_type='application/json')
+            duplicate_ms = (time.perf_counter() - started) * 1000
+            raise Rollback
+    except Rollback:
+        pass
+
+    if timings and len(timings) == options['signups'] and not report['failures']:
+        result = summarize(timings)
+        report['signups'] = {
+            **result,
+            'signups_per_second': round(1000 / result['mean_ms'], 1),
+            'queries_per_signup': max(queries),
+            'duplicate_ms': round(duplicate_ms, 3),
+        }
+        stdout.write(f"  signup: p50 {result['p50_ms']}ms, {report['signups']['signups_per_second']} per second, "
+                     f"{max(queries)} queries; duplicate {duplicate_ms:.1f}ms")
+        if max(queries) > 1:
+            report['failures'].append(f'a signup took {max(queries)} queries, expected a single INSERT')
+        expected = {'username': [RegistrationSerializer.DUPLICATE_ERRORS['username']]}
+        if response.status_code != 400 or json.loads(response.content) != expected:
+            report['failures'].append(f'duplicate signup returned {response.status_code}: {response.content[:200]!r}')
+    return report
@@ -0,0 +1,104 @@
+"""
+Hammer one SKU from many threads and check stock is never oversold.
+
+Every thread places single-item orders through ``OrderSerializer`` (the same
+path as ``POST /api/orders/``) against one product. Afterwards the number of
+accepted orders must equal the starting stock, the stock must be exactly zero
+and no order may have waited on row locks for longer than ``--max-wait-ms``.
+The product, user and orders are deleted at the end.
+"""
+import threading
+import time
+import uuid
+
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from soya_store.models import User, Product, Order
+from soya_store.serializers import OrderSerializer
+from .utils import summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=20, help='Orders attempted per thread')
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+    parser.add_argument('--max-wait-ms', type=float, default=1000.0,
+                        help='Fail if any single order takes longer than this')
+
+
+def run(options, stdout):
+    tag = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f'stock-bench-{tag}', email=f'stock-bench-{tag}@example.com',
+                                    password=uuid.uuid4().hex)
+    product = Product.objects.create(name=f'Stock benchmark {tag}', description='', price='9.99',
+                                     category='Benchmark', image_url='', stock=options['stock'])
+    payload = {
+        'user': user.id,
+        'total': '9.99',
+        'items': [{'productId': product.id, 'quantity': options['quantity'], 'price': '9.99'}],
+        'shipping_address': {'street': '1 Main St', 'city': 'Springfield', 'state': 'IL', 'zip': '62701'},
+        'payment_method': 'Credit Card',
+    }
+
+    lock = threading.Lock()
+    accepted, rejected, errors, timings = [], [], [], []
+    start_barrier = threading.Barrier(options['threads'])
+
+    def worker():
+        start_barrier.wait()
+        try:
+            for _ in range(options['attempts']):
+                serializer = OrderSerializer(data=payload)
+                serializer.is_valid(raise_exception=True)
+                started = time.perf_counter()
+                try:
+                    order = serializer.save(user=user)
+                    outcome = accepted, order.id
+                except ValidationError:
+                    outcome = rejected, None
+                except Exception as exc:  # deadlocks, lock timeouts, ...
+                    outcome = errors, repr(exc)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    outcome[0].append(outcome[1])
+                    timings.append(elapsed)
+        finally:
+            connection.close()
+
+    stdout.write(f"Placing {options['threads'] * options['attempts']} orders against stock of {options['stock']}...")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    product.refresh_from_db()
+    expected = min(options['stock'] // options['quantity'], options['threads'] * options['attempts'])
+    failures = []
+    if len(accepted) != expected:
+        failures.append(f'{len(accepted)} orders accepted, expected {expected}')
+    if product.stock != options['stock'] - len(accepted) * options['quantity'] or product.stock < 0:
+        failures.append(f'final stock {product.stock} does not match {len(accepted)} accepted orders')
+    if errors:
+        failures.append(f'{len(errors)} orders raised errors, e.g. {errors[0]}')
+    if timings and max(timings) > options['max_wait_ms']:
+        failures.append(f'slowest order took {max(timings):.1f}ms (limit {options["max_wait_ms"]}ms)')
+
+    with transaction.atomic():
+        Order.objects.filter(user=user).delete()
+        product.delete()
+        user.delete()
+
+    return {
+        'accepted': len(accepted),
+        'rejected': len(rejected),
+        'errors': len(errors),
+        'final_stock': product.stock,
+        'orders_per_second': round(len(timings) / wall_seconds, 1),
+        'latency': summarize(timings),
+        'failures': failures,
+    }
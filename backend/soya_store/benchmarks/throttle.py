@@ -0,0 +1,79 @@
+"""
+Compare the counter throttle with DRF's history-list throttle.
+
+Measures per-request ``allow_request`` cost for a client whose history is
+already near the daily ``user`` limit, then has concurrent workers race for
+the same key and checks that no more requests than the limit are admitted.
+"""
+import threading
+import uuid
+from types import SimpleNamespace
+
+from django.test import RequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from soya_store.throttling import CounterUserRateThrottle
+from .utils import summarize, time_calls
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=900,
+                        help='Requests already recorded for the client before measuring')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--limit', type=int, default=100, help='Rate limit for the concurrency check')
+
+
+def _throttle(base, rate):
+    return type(f'Bench{base.__name__}', (base,), {'rate': rate})
+
+
+def _request(user_id):
+    request = RequestFactory().get('/api/orders/my/')
+    request.user = SimpleNamespace(is_authenticated=True, pk=user_id)
+    return request
+
+
+def _measure(throttle_class, history, repeat):
+    request = _request(f'bench-{uuid.uuid4().hex}')
+    # Generous rate so the measured requests are all admitted
+    throttle_class = _throttle(throttle_class, f'{history + repeat + 1}/day')
+    for _ in range(history):
+        throttle_class().allow_request(request, None)
+    return summarize(time_calls(lambda: throttle_class().allow_request(request, None), repeat))
+
+
+def _race(throttle_class, threads, limit):
+    throttle_class = _throttle(throttle_class, f'{limit}/day')
+    request = _request(f'bench-{uuid.uuid4().hex}')
+    admitted = []
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        allowed = sum(throttle_class().allow_request(request, None) for _ in range(limit))
+        admitted.append(allowed)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(admitted)
+
+
+def run(options, stdout):
+    report = {'cost': {}, 'concurrency': {}, 'failures': []}
+    for name, throttle_class in (('drf_history', UserRateThrottle), ('counter', CounterUserRateThrottle)):
+        cost = _measure(throttle_class, options['history'], options['repeat'])
+        admitted = _race(throttle_class, options['threads'], options['limit'])
+        report['cost'][name] = cost
+        report['concurrency'][name] = {'limit': options['limit'], 'admitted': admitted}
+        stdout.write(f"  {name}: p50 {cost['p50_ms'] * 1000:.1f}us per request, "
+                     f"{admitted} admitted for a limit of {options['limit']}")
+
+    if report['concurrency']['counter']['admitted'] > options['limit']:
+        report['failures'].append(
+            f"counter throttle admitted {report['concurrency']['counter']['admitted']} requests over a limit of {options['limit']}"
+        )
+    return report
@@ -0,0 +1,36 @@
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest-rank)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    """Summarise a list of millisecond timings"""
+    return {
+        'runs': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3) if samples_ms else None,
+        'p50_ms': round(percentile(samples_ms, 50), 3) if samples_ms else None,
+        'p95_ms': round(percentile(samples_ms, 95), 3) if samples_ms else None,
+        'max_ms': round(max(samples_ms), 3) if samples_ms else None,
+    }
+
+
+def time_calls(func, repeat):
+    """Call ``func`` ``repeat`` times and return per-call timings in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+class Rollback(Exception):
+    """Raised to roll back a benchmark's seeded data at the end of a run"""
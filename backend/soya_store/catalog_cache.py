@@ -0,0 +1,239 @@
+"""
+Versioned read-through cache for the public product catalog.
+
+Serialized catalog payloads are stored under keys that embed the current
+catalog version. Any write to ``Product`` bumps the version, which makes every
+previously cached payload unreachable at once (the stale entries simply expire),
+so no per-key invalidation bookkeeping is needed.
+
+Stock is the exception. Every checkout changes it, and bumping the version
+for each one would empty the cache under exactly the load it is meant to
+absorb. ``reserve_stock`` instead publishes the new levels under per-product
+keys, and ``with_live_stock`` applies them to cached payloads as they are
+served. The displayed stock is informational only; ``reserve_stock`` is what
+decides whether an order can be filled.
+"""
+import hashlib
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:version'
+# When the version last changed, as an integer timestamp. Deliberately
+# outside the 'catalog:' prefix that TieredCache keeps per process: a local
+# copy older than the local version could stamp new entries with the
+# previous version's time.
+MODIFIED_KEY = 'catalog-modified'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+# How long a cached payload may live; the version bump is what keeps it fresh
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _incr(key, delta=1):
+    """Atomically increment a counter, creating it if it does not exist yet"""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if needed"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never reuses
+        # a number that may still have payloads cached under it
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_catalog_modified():
+    """Return when the catalog version last changed, as an integer timestamp"""
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        # Unknown (first use, or evicted): claim now, which can only make
+        # clients revalidate once more than needed
+        cache.add(MODIFIED_KEY, int(time.time()), None)
+        modified = cache.get(MODIFIED_KEY)
+    return modified
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog payload"""
+    # Moved before the version, so no entry of the new version can be stored
+    # with the old timestamp. HTTP dates have one-second resolution: each
+    # version's timestamp is kept later than the last, so a client holding
+    # the previous Last-Modified never gets a 304 for the new version.
+    previous = cache.get(MODIFIED_KEY) or 0
+    cache.set(MODIFIED_KEY, max(int(time.time()), previous + 1), None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(VERSION_KEY, version, None)
+    logger.debug(f"Catalog version bumped to {version}")
+    return version
+
+
+def invalidate_catalog():
+    """
+    Bump the catalog version once the current transaction commits.
+
+    Bumping earlier would let a concurrent reader cache the pre-commit rows
+    under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+class CatalogEntry(NamedTuple):
+    """A cached catalog payload with its validators for conditional GETs"""
+    data: object
+    etag: str
+    last_modified: Optional[int]
+
+
+def _products(data):
+    """The product dicts in a catalog payload: a list, a page, or one product"""
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        data = data['results']
+    return [product for product in (data if isinstance(data, list) else [data]) if isinstance(product, dict)]
+
+
+def _weak_etag(value):
+    return 'W/' + quote_etag(hashlib.md5(value, usedforsecurity=False).hexdigest())
+
+
+def make_entry(data):
+    """
+    Wrap a serialized payload with validators for conditional GETs.
+
+    The ETag is a hash of the payload's JSON. It is weak because the same
+    entry is also served as indented JSON and through the browsable API.
+    Last-Modified is when the catalog version last changed, not the newest
+    ``updated_at`` in the payload: a product leaving a filtered list, or an
+    ``update()`` that skips ``auto_now``, changes a payload without moving
+    any of its timestamps forward.
+    """
+    # Imported here: models.py imports this module before DRF can be loaded
+    from .renderers import FastJSONRenderer
+    return CatalogEntry(data, _weak_etag(FastJSONRenderer().render(data)), get_catalog_modified())
+
+
+def stock_key(version, product_id):
+    return f'catalog:v{version}:stock:{product_id}'
+
+
+def publish_stock(levels):
+    """
+    Once the current transaction commits, record ``levels``
+    (``{product_id: stock}``) as the live stock for cached payloads of the
+    current catalog version. A version bump leaves them behind along with
+    the payloads they corrected.
+    """
+    def publish():
+        version = get_catalog_version()
+        published_at = int(time.time())
+        cache.set_many(
+            {stock_key(version, product_id): (stock, published_at) for product_id, stock in levels.items()},
+            CATALOG_CACHE_TIMEOUT,
+        )
+    transaction.on_commit(publish)
+
+
+def _apply_stock(data, levels):
+    """A copy of ``data`` with the stock of the products in ``levels`` replaced"""
+    def apply(product):
+        if isinstance(product, dict) and product.get('id') in levels:
+            return {**product, 'stock': levels[product['id']]}
+        return product
+    if isinstance(data, list):
+        return [apply(product) for product in data]
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return {**data, 'results': [apply(product) for product in data['results']]}
+    return apply(data)
+
+
+def with_live_stock(entry):
+    """
+    Return ``entry`` with the stock levels published since it was cached
+    applied, and validators that change with them. Cached entries are never
+    modified, since the per-process cache tier shares them between requests.
+    """
+    product_ids = [product['id'] for product in _products(entry.data) if 'id' in product and 'stock' in product]
+    if not product_ids:
+        return entry
+    version = get_catalog_version()
+    published = cache.get_many([stock_key(version, product_id) for product_id in product_ids])
+    if not published:
+        return entry
+    levels = {}
+    last_modified = entry.last_modified
+    for product_id in product_ids:
+        level = published.get(stock_key(version, product_id))
+        if level is not None:
+            levels[product_id], published_at = level
+            last_modified = max(last_modified or published_at, published_at)
+    etag = _weak_etag(f'{entry.etag}|{sorted(levels.items())}'.encode())
+    return CatalogEntry(_apply_stock(entry.data, levels), etag, last_modified)
+
+
+def make_key(view_name, request, *parts, include_query=True):
+    """
+    Build the cache key for a catalog view under the current version. The
+    scheme and host are part of it, since paginated payloads carry absolute
+    ``next``/``previous`` URLs, and so is the query string unless
+    ``include_query`` is False.
+    """
+    query = request.META.get('QUERY_STRING', '') if include_query else ''
+    raw = '|'.join([view_name, request.scheme, request.get_host(), *[str(part) for part in parts], query])
+    digest = hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f"catalog:v{get_catalog_version()}:{view_name}:{digest}"
+
+
+def lookup(key):
+    """Return the cached ``CatalogEntry`` for ``key`` (or None), recording a hit or miss"""
+    entry = cache.get(key)
+    if not isinstance(entry, CatalogEntry):
+        # Also skips bare payloads cached before entries carried validators
+        entry = None
+    _incr(HITS_KEY if entry is not None else MISSES_KEY)
+    return entry
+
+
+def store(key, data):
+    """Store a freshly serialized payload; returns its ``CatalogEntry``"""
+    entry = make_entry(data)
+    cache.set(key, entry, CATALOG_CACHE_TIMEOUT)
+    return entry
+
+
+def stats():
+    """Return hit/miss counters for the catalog cache"""
+    values = cache.get_many([HITS_KEY, MISSES_KEY, VERSION_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': values.get(VERSION_KEY),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    """Reset the hit/miss counters"""
+    cache.delete_many([HITS_KEY, MISSES_KEY])
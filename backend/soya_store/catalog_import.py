@@ -0,0 +1,172 @@
+"""
+Streaming product import used by the ``import_products`` command.
+
+Rows are read lazily from CSV or JSONL, validated with the model fields' own
+``to_python`` and validators, and upserted in batches with
+``bulk_create(update_conflicts=True)`` keyed on ``Product.sku``. Rows without
+a SKU are keyed on their slugified name, the same SKU migration 0006 gave the
+products that already existed.
+
+Only the columns a row carries are written: a feed without, say, ``stock``
+leaves the stock of existing products alone, and new products get the model
+defaults for whatever is missing. A column that is present but blank resets
+the field to its default.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Product
+from .renderers import orjson
+
+# Importable fields; anything else in a row is ignored
+FIELDS = [
+    'sku', 'name', 'description', 'price', 'category', 'subcategory', 'image_url', 'rating',
+    'reviews', 'is_featured', 'is_best_seller', 'is_on_sale', 'original_price', 'stock',
+]
+REQUIRED = {'name', 'price', 'category'}
+# Values used when a non-nullable column without a model default is missing
+FALLBACKS = {'description': '', 'image_url': ''}
+
+# camelCase names used by the Express API's product feed
+ALIASES = {
+    'imageUrl': 'image_url',
+    'isFeatured': 'is_featured',
+    'isBestSeller': 'is_best_seller',
+    'isOnSale': 'is_on_sale',
+    'originalPrice': 'original_price',
+}
+
+TRUE_VALUES = {'true', 't', 'yes', 'y', '1'}
+FALSE_VALUES = {'false', 'f', 'no', 'n', '0', ''}
+
+
+class RowError(Exception):
+    """A row that failed validation; ``line`` is its 1-based position in the file"""
+    def __init__(self, line, errors):
+        self.line = line
+        self.errors = errors
+        super().__init__(f"line {line}: {'; '.join(f'{field}: {message}' for field, message in errors.items())}")
+
+
+def derive_sku(name):
+    return slugify(name)[:64]
+
+
+def read_csv(stream):
+    """Yield ``(line, row)`` pairs from a CSV file with a header row"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """Yield ``(line, row)`` pairs from a file with one JSON object per line"""
+    loads = orjson.loads if orjson is not None else json.loads
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = loads(text)
+        except ValueError as exc:
+            row = exc
+        yield line, row
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValidationError('must be a boolean')
+
+
+def clean_row(line, row):
+    """Validate one raw row and return the cleaned field values, or raise ``RowError``"""
+    if not isinstance(row, dict):
+        raise RowError(line, {'row': str(row) if isinstance(row, Exception) else 'must be an object'})
+
+    values = {}
+    for key, value in row.items():
+        name = ALIASES.get(key, key)
+        if name in FIELDS:
+            # Blank CSV cells mean "not given"
+            values[name] = None if isinstance(value, str) and not value.strip() else value
+
+    cleaned = {}
+    errors = {}
+    for name in FIELDS:
+        field = Product._meta.get_field(name)
+        if name not in values and name not in REQUIRED:
+            continue
+        value = values.get(name)
+        if value is None:
+            if name in REQUIRED:
+                errors[name] = 'is required'
+            elif field.null:
+                cleaned[name] = None
+            elif field.has_default():
+                cleaned[name] = field.get_default()
+            else:
+                cleaned[name] = FALLBACKS[name]
+            continue
+        try:
+            if field.get_internal_type() == 'BooleanField':
+                value = _boolean(value)
+            elif field.get_internal_type() == 'DecimalField' and isinstance(value, float):
+                # JSON numbers: go through repr so 4.99 stays 4.99
+                value = Decimal(repr(value))
+            value = field.to_python(value)
+            field.run_validators(value)
+        except ValidationError as exc:
+            errors[name] = ' '.join(exc.messages)
+            continue
+        cleaned[name] = value.strip() if isinstance(value, str) else value
+
+    for name in ('price', 'original_price', 'rating', 'reviews', 'stock'):
+        if cleaned.get(name) is not None and cleaned[name] < 0:
+            errors.setdefault(name, 'must not be negative')
+
+    if errors:
+        raise RowError(line, errors)
+    if not cleaned.get('sku'):
+        cleaned['sku'] = derive_sku(cleaned['name'])
+        if not cleaned.get('sku'):
+            raise RowError(line, {'sku': 'cannot be derived from the name'})
+    return cleaned
+
+
+def upsert(rows, dry_run=False):
+    """
+    Upsert one batch of cleaned rows in a single statement.
+
+    Returns ``(created, updated)``. Rows sharing a SKU collapse into the last
+    one, since one INSERT ... ON CONFLICT cannot update the same row twice.
+    Rows are written in one statement per set of columns they carry, so an
+    existing product is only updated in the columns its row gave.
+    """
+    by_sku = {row['sku']: row for row in rows}
+    existing = set(Product.objects.filter(sku__in=by_sku).values_list('sku', flat=True))
+    if not dry_run:
+        by_columns = {}
+        for row in by_sku.values():
+            by_columns.setdefault(tuple(name for name in FIELDS if name in row), []).append(row)
+        with transaction.atomic():
+            for columns, group in by_columns.items():
+                Product.objects.bulk_create(
+                    [Product(**row) for row in group],
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=[name for name in columns if name != 'sku'] + ['updated_at'],
+                )
+    return len(by_sku) - len(existing), len(existing)
@@ -0,0 +1,23 @@
+from rest_framework import status, views
+from rest_framework.exceptions import APIException
+
+from .hashing_pool import HashingPoolBusy
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins are in progress. Please try again shortly.'
+    default_code = 'hashing_busy'
+
+
+def exception_handler(exc, context):
+    """
+    DRF's exception handler, plus a 503 with ``Retry-After`` for a password
+    hash refused by the full hashing pool.
+    """
+    if isinstance(exc, HashingPoolBusy):
+        busy = PasswordHashingBusy()
+        # DRF's handler sends this as Retry-After
+        busy.wait = exc.retry_after
+        exc = busy
+    return views.exception_handler(exc, context)
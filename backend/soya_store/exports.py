@@ -0,0 +1,152 @@
+"""
+Streaming order exports for admins.
+
+Orders are read through a server-side cursor in fixed-size chunks and written
+out one flat record per line item (order columns repeated, shipping address
+spread over ``shipping_*`` columns), so memory use does not grow with the
+number of orders exported.
+
+The cursor is only server-side inside a transaction: in autocommit mode
+Postgres declares it WITH HOLD, which materialises the whole result set up
+front, so ``order_records`` holds one open while it streams.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order
+from .renderers import orjson
+
+# Chunk size for the server-side cursor
+ORDER_EXPORT_CHUNK_SIZE = getattr(settings, 'ORDER_EXPORT_CHUNK_SIZE', 2000)
+
+# Keys of the storefront's address form (shared/schema.ts addressSchema)
+SHIPPING_FIELDS = ['fullName', 'addressLine1', 'addressLine2', 'city', 'state', 'postalCode', 'country', 'phone']
+
+COLUMNS = [
+    'order_id', 'user_id', 'status', 'total', 'payment_method', 'created_at', 'updated_at',
+    *[f'shipping_{field}' for field in SHIPPING_FIELDS],
+    'item_index', 'item_product_id', 'item_name', 'item_quantity', 'item_unit_price',
+]
+
+# Columns holding text customers typed in, which spreadsheets could run as formulas
+FREE_TEXT_COLUMNS = {'payment_method', 'item_name', *[f'shipping_{field}' for field in SHIPPING_FIELDS]}
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parse_bound(value):
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime; a
+    date means midnight at its start. Returns None when ``value`` is invalid.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_queryset(statuses=None, created_after=None, created_before=None):
+    """Orders to export, oldest first; the bounds are ``created_after <= created_at < created_before``"""
+    queryset = Order.objects.all()
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if created_after is not None:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before is not None:
+        queryset = queryset.filter(created_at__lt=created_before)
+    return queryset.order_by('created_at', 'id')
+
+
+def order_records(queryset, chunk_size=ORDER_EXPORT_CHUNK_SIZE):
+    """Yield one flat dict per line item; orders without items yield one record with empty item columns"""
+    with transaction.atomic(using=queryset.db):
+        yield from _order_records(queryset, chunk_size)
+
+
+def _order_records(queryset, chunk_size):
+    for order in queryset.iterator(chunk_size=chunk_size):
+        shipping_address = order.shipping_address
+        if not isinstance(shipping_address, dict):
+            shipping_address = {}
+        base = {
+            'order_id': order.id,
+            'user_id': order.user_id,
+            'status': order.status,
+            'total': str(order.total),
+            'payment_method': order.payment_method,
+            'created_at': order.created_at.isoformat(),
+            'updated_at': order.updated_at.isoformat(),
+            **{f'shipping_{field}': shipping_address.get(field) for field in SHIPPING_FIELDS},
+        }
+        
+        # line_items() skips entries that are not objects, so zip against the same subset
+        items = order.items or []
+        raw_items = [item for item in (items if isinstance(items, list) else [items]) if isinstance(item, dict)]
+        lines = list(zip(raw_items, order.line_items()))
+        if not lines:
+            yield {**base, 'item_index': None, 'item_product_id': None, 'item_name': None,
+                   'item_quantity': None, 'item_unit_price': None}
+            continue
+        for index, (item, (product_id, quantity, unit_price)) in enumerate(lines):
+            yield {
+                **base,
+                'item_index': index,
+                'item_product_id': product_id,
+                'item_name': item.get('name'),
+                'item_quantity': quantity,
+                'item_unit_price': str(unit_price) if unit_price is not None else None,
+            }
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the formatted line back to the caller"""
+    def write(self, value):
+        return value
+
+
+def csv_cell(column, value):
+    """Format one CSV cell, defusing free text that a spreadsheet would read as a formula"""
+    if value is None:
+        return ''
+    if column in FREE_TEXT_COLUMNS and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for record in records:
+        yield writer.writerow([csv_cell(column, record[column]) for column in COLUMNS])
+
+
+def ndjson_lines(records):
+    if orjson is not None:
+        for record in records:
+            yield orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def stream(records, output_format):
+    """Encode ``records`` as ``output_format`` ('csv' or 'ndjson'), line by line"""
+    return csv_lines(records) if output_format == 'csv' else ndjson_lines(records)
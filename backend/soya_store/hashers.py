@@ -0,0 +1,34 @@
+"""
+Password hashing with a configurable work factor.
+
+``PASSWORD_PBKDF2_ITERATIONS`` sets the PBKDF2 iteration count, which is
+nearly all of the CPU a signup or login spends. Measure it with
+``python manage.py benchmark signup``. Stored hashes keep their own
+iteration count, so changing the setting never locks anyone out: Django
+re-hashes a password with the current count the next time it is verified.
+The key derivation itself runs in soya_store.hashing_pool.
+"""
+import base64
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.encoding import force_bytes
+
+from . import hashing_pool
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's ``pbkdf2_sha256`` hasher with the iteration count taken from
+    settings, deriving keys in the hashing pool. It keeps the same algorithm
+    name and encoding, so existing hashes verify unchanged.
+    """
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+    def encode(self, password, salt, iterations=None):
+        # verify() and harden_runtime() both go through encode()
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        derived = hashing_pool.pbkdf2(self.digest().name, force_bytes(password), force_bytes(salt), iterations)
+        hash = base64.b64encode(derived).decode('ascii').strip()
+        return '%s$%d$%s$%s' % (self.algorithm, iterations, salt, hash)
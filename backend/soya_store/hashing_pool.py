@@ -0,0 +1,134 @@
+"""
+Password hashing in a bounded process pool.
+
+PBKDF2 is nearly all of the CPU a login or signup spends. Instead of running
+it on the request thread, ``ConfigurablePBKDF2PasswordHasher`` can hand the
+key derivation to a small pool of worker processes, so every hash made
+through Django's auth machinery is pooled: ``authenticate()``,
+``check_password``, ``create_user`` and the dummy hash for unknown usernames
+alike.
+
+With ``PASSWORD_HASHING_WORKERS`` above 0, each web worker process runs its
+own pool of that many processes, started by ``soya_project.wsgi`` and
+``soya_project.asgi`` when the web worker boots (or on first use, in a
+process forked after that). The pool uses the ``spawn`` start method: the
+workers only run ``hashlib.pbkdf2_hmac`` and never import the project.
+Admission is bounded. Once ``PASSWORD_HASHING_MAX_PENDING`` hashes are
+waiting or running in a process, further hashes are refused with
+``HashingPoolBusy``, which DRF views answer with a 503 and ``Retry-After``
+(see ``soya_store.exceptions``). A login storm then gets fast refusals
+instead of requests that hold their threads until they time out. Queue
+depth, waits, and rejections are exported through ``soya_project.metrics``.
+
+The default of 0 hashes on the request thread.
+"""
+import concurrent.futures
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from soya_project import metrics
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASHING_WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', 0)
+PASSWORD_HASHING_MAX_PENDING = getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', 16)
+
+
+class HashingPoolBusy(Exception):
+    """Raised instead of queueing a hash behind ``PASSWORD_HASHING_MAX_PENDING`` others"""
+    # Seconds a client should wait before trying again
+    retry_after = 1
+
+
+class HashingPool:
+    """A lazily started process pool with a cap on pending hashes"""
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executor = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        """
+        The pool for this process, started on first use. Called with the lock
+        held; a pool inherited across a fork belongs to the parent, so the
+        child starts its own.
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.executor = None
+            self.pending = 0
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self.executor
+
+    def start(self):
+        """Start this process's pool and its workers now rather than on the first hash"""
+        if not self.workers:
+            return
+        with self.lock:
+            executor = self._executor()
+        # Workers are spawned as tasks arrive; one trivial hash each starts them all
+        for future in [executor.submit(hashlib.pbkdf2_hmac, 'sha256', b'', b'', 1) for _ in range(self.workers)]:
+            future.result()
+
+    def pbkdf2(self, digest_name, password, salt, iterations):
+        """``hashlib.pbkdf2_hmac`` in a pool worker; raises HashingPoolBusy when full"""
+        started = time.perf_counter()
+        if not self.workers:
+            derived = hashlib.pbkdf2_hmac(digest_name, password, salt, iterations)
+            metrics.password_hash_finished('inline', time.perf_counter() - started)
+            return derived
+
+        with self.lock:
+            executor = self._executor()
+            depth = self.pending
+            if depth >= self.max_pending:
+                metrics.password_hash_rejected()
+                raise HashingPoolBusy()
+            self.pending += 1
+        metrics.password_hash_submitted(depth)
+
+        mode = 'pool'
+        try:
+            derived = executor.submit(hashlib.pbkdf2_hmac, digest_name, password, salt, iterations).result()
+        except BrokenProcessPool:
+            # A worker died (killed for memory, say). Start a fresh pool for
+            # the next hash and answer this one on the request thread.
+            logger.warning("Password hashing pool broke; restarting it")
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            executor.shutdown(wait=False)
+            mode = 'inline'
+            derived = hashlib.pbkdf2_hmac(digest_name, password, salt, iterations)
+        finally:
+            with self.lock:
+                if self.pid == os.getpid():
+                    self.pending -= 1
+        metrics.password_hash_finished(mode, time.perf_counter() - started)
+        return derived
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+pool = HashingPool(PASSWORD_HASHING_WORKERS, PASSWORD_HASHING_MAX_PENDING)
+
+
+def pbkdf2(digest_name, password, salt, iterations):
+    return pool.pbkdf2(digest_name, password, salt, iterations)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from soya_store.models import Product, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Populate OrderItem rows from Order.items_json for orders that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of orders read and written per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        scanned = created = 0
+
+        self.stdout.write(self.style.NOTICE('Backfilling order items...'))
+        while True:
+            # Keyset chunks: each one is an index range scan on the primary key
+            orders = list(
+                Order.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'items_json')[:chunk_size]
+            )
+            if not orders:
+                break
+            last_id = orders[-1].id
+            scanned += len(orders)
+
+            done = set(
+                OrderItem.objects.filter(order_id__in=[order.id for order in orders])
+                .values_list('order_id', flat=True)
+                .distinct()
+            )
+            pending = [order for order in orders if order.id not in done]
+
+            product_ids = {
+                product_id
+                for order in pending
+                for product_id, _, _ in order.line_items()
+                if product_id is not None
+            }
+            prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'price'))
+
+            items = [item for order in pending for item in OrderItem.objects.build_for(order, prices)]
+            with transaction.atomic():
+                OrderItem.objects.bulk_create(items, batch_size=5000)
+            created += len(items)
+
+            self.stdout.write(f'Scanned {scanned} orders (up to #{last_id}), created {created} items')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfill completed: {created} items for {scanned} orders scanned'))
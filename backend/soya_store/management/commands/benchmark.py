@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from soya_store import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run a benchmark from soya_store.benchmarks and report the results'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name in benchmarks.BENCHMARKS:
+            module = benchmarks.load(name)
+            subparser = subparsers.add_parser(name, help=(module.__doc__ or '').strip().splitlines()[0])
+            subparser.add_argument('--output', help='Write the JSON report to this file')
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        name = options['benchmark']
+        self.stdout.write(self.style.NOTICE(f'Running benchmark: {name}'))
+
+        report = benchmarks.load(name).run(options, self.stdout)
+        report = {'benchmark': name, **report}
+
+        output = json.dumps(report, indent=2, default=str)
+        if options.get('output'):
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        failures = report.get('failures', [])
+        if failures:
+            raise CommandError(f'{len(failures)} check(s) failed: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All checks passed'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from soya_store import synthetic
+from soya_store.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset at production scale with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--notifications', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed; the same seed always generates the same data')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Username prefix, so several datasets can live side by side')
+        parser.add_argument('--batch-size', type=int, default=synthetic.DEFAULT_BATCH_SIZE,
+                            help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-user-').exists():
+            raise CommandError(f"Users with the prefix '{prefix}' already exist; pass a different --prefix")
+
+        def progress(stage, count, seconds):
+            self.stdout.write(f'Created {count} {stage} in {seconds:.1f}s')
+
+        self.stdout.write(self.style.NOTICE(f"Generating synthetic data with seed {options['seed']}..."))
+        with transaction.atomic():
+            synthetic.generate_dataset(
+                users=options['users'],
+                products=options['products'],
+                orders=options['orders'],
+                notifications=options['notifications'],
+                seed=options['seed'],
+                prefix=prefix,
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        self.stdout.write(self.style.SUCCESS('Synthetic data generated'))
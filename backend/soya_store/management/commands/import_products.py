@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from soya_store import catalog_import
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV or JSONL file, upserting on SKU in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file to import, or '-' for stdin")
+        parser.add_argument('--format', choices=sorted(catalog_import.READERS),
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows validated and upserted per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file and report what would change without writing')
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help='Number of invalid rows to print (all are counted)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            input_format = {'ndjson': 'jsonl'}.get(extension, extension)
+            if input_format not in catalog_import.READERS:
+                raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        if path == '-':
+            self._import(sys.stdin, input_format, options)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8-sig')
+            except OSError as exc:
+                raise CommandError(f'Cannot open {path}: {exc}')
+            with stream:
+                self._import(stream, input_format, options)
+
+    def _import(self, stream, input_format, options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+        read = invalid = created = updated = 0
+        batch = []
+
+        def flush():
+            nonlocal created, updated
+            batch_created, batch_updated = catalog_import.upsert(batch, dry_run=dry_run)
+            created += batch_created
+            updated += batch_updated
+            batch.clear()
+            rate = read / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(f"Read {read} rows ({invalid} invalid), {created + updated} "
+                              f"{'validated' if dry_run else 'upserted'}, {rate:.0f} rows/s")
+
+        self.stdout.write(self.style.NOTICE(f"{'Validating' if dry_run else 'Importing'} products..."))
+        for line, row in catalog_import.READERS[input_format](stream):
+            read += 1
+            try:
+                batch.append(catalog_import.clean_row(line, row))
+            except catalog_import.RowError as exc:
+                invalid += 1
+                if invalid <= options['max_errors']:
+                    self.stderr.write(self.style.WARNING(f'Skipping {exc}'))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        elapsed = time.perf_counter() - started
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f'{read} rows read in {elapsed:.1f}s: {created} products {verb} created, '
+            f'{updated} {verb} updated, {invalid} rows skipped as invalid'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from soya_store import revocation
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired and can no longer be presented'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = revocation.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired revoked tokens'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from soya_store import notifications
+
+
+class Command(BaseCommand):
+    help = "Repair drift between users' stored unread counters and their notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted counters without fixing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Checking unread notification counters...'))
+        drift = notifications.find_drift()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All unread counters are accurate'))
+            return
+
+        for user_id, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f'User {user_id}: stored {stored}, actual {actual}'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} counters have drifted (dry run, not fixed)'))
+            return
+
+        repaired = notifications.reconcile(list(drift))
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} unread counters'))
@@ -0,0 +1,53 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Name matches weigh most, then category/subcategory, then description
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(NEW.category, '') || ' ' || coalesce(NEW.subcategory, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION soya_store_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_SQL};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER soya_store_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description, category, subcategory, search_vector
+    ON soya_store_product
+    FOR EACH ROW EXECUTE FUNCTION soya_store_product_search_vector_update();
+
+-- Backfill existing rows through the trigger
+UPDATE soya_store_product SET name = name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS soya_store_product_search_vector_trigger ON soya_store_product;
+DROP FUNCTION IF EXISTS soya_store_product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soya_store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def backfill_skus(apps, schema_editor):
+    """Give existing products the SKU an import would derive from their name"""
+    Product = apps.get_model('soya_store', 'Product')
+    seen = set()
+    products = []
+    for product in Product.objects.order_by('id').only('id', 'name').iterator(chunk_size=2000):
+        sku = slugify(product.name)[:64]
+        # Later duplicates keep no SKU rather than clash with the first
+        if not sku or sku in seen:
+            continue
+        seen.add(sku)
+        product.sku = sku
+        products.append(product)
+    Product.objects.bulk_update(products, ['sku'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soya_store', '0005_user_unread_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
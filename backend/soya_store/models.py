@@ -1,16 +1,116 @@
-from django.db import models
+from django.db import connections, models
+from decimal import Decimal, InvalidOperation
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
 import json
+import re
 from django.contrib.auth.models import AbstractUser
+from .catalog_cache import invalidate_catalog, publish_stock
 
 class User(AbstractUser):
     name = models.CharField(max_length=100, blank=True)
     email = models.EmailField(unique=True)
     is_admin = models.BooleanField(default=False)
+    # Denormalised; maintained by soya_store.notifications
+    unread_notifications = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
 
+class OutOfStock(Exception):
+    """Raised when a stock reservation cannot be satisfied"""
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for products: {self.product_ids}")
+
+def positive_int(value):
+    """``value`` if it is an integer of at least 1; ValueError for anything else, bools and floats included"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f'not a positive integer: {value!r}')
+    return value
+
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet that invalidates the catalog cache on bulk writes, which bypass
+    the ``post_save``/``post_delete`` signals.
+    """
+    def search(self, text):
+        """
+        Full-text search over the trigger-maintained ``search_vector``, ranked
+        by relevance. Every term is prefix-matched so partial words still hit.
+        """
+        terms = re.findall(r'[^\W_]+', text)
+        if not terms:
+            return self.none()
+        query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='english')
+        return (
+            self.filter(search_vector=query)
+            .annotate(rank=SearchRank(models.F('search_vector'), query))
+            .order_by('-rank', 'id')
+        )
+
+    def reserve_stock(self, quantities):
+        """
+        Take ``quantities`` (``{product_id: quantity}``) out of stock in a
+        single statement, returning ``{product_id: price}``.
+
+        Rows are locked in primary-key order so concurrent orders cannot
+        deadlock, and each row is only decremented while ``stock >= quantity``,
+        so stock never goes negative. If any product is missing or short,
+        ``OutOfStock`` is raised; call this inside ``transaction.atomic()`` so
+        the rows that were decremented are rolled back with it.
+        """
+        if not quantities:
+            return {}
+        table = self.model._meta.db_table
+        values = ', '.join(['(%s::bigint, %s::integer)'] * len(quantities))
+        params = [value for item in quantities.items() for value in item]
+        sql = f"""
+            WITH requested (id, quantity) AS (VALUES {values}),
+            locked AS (
+                SELECT p.id FROM {table} p JOIN requested r ON r.id = p.id
+                ORDER BY p.id FOR UPDATE OF p
+            )
+            UPDATE {table} p
+            SET stock = p.stock - r.quantity, updated_at = NOW()
+            FROM requested r JOIN locked l ON l.id = r.id
+            WHERE p.id = r.id AND p.stock >= r.quantity
+            RETURNING p.id, p.price, p.stock
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        reserved = {product_id: price for product_id, price, _ in rows}
+
+        if len(reserved) != len(quantities):
+            raise OutOfStock(set(quantities) - set(reserved))
+
+        # Only stock changed, so publish the new levels for cached payloads
+        # instead of invalidating the whole catalog on every checkout
+        publish_stock({product_id: stock for product_id, _, stock in rows})
+        return reserved
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            invalidate_catalog()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            invalidate_catalog()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            invalidate_catalog()
+        return rows
+
 class Product(models.Model):
+    # Stable key for catalog imports; see soya_store.catalog_import
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -26,6 +126,19 @@ class Product(models.Model):
     stock = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger, see migration 0002
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            models.Index(fields=['category'], name='product_category_idx'),
+            # Partial indexes: only the few flagged rows are indexed
+            models.Index(fields=['id'], condition=models.Q(is_featured=True), name='product_featured_idx'),
+            models.Index(fields=['id'], condition=models.Q(is_best_seller=True), name='product_bestseller_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -50,25 +163,75 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # items_json and shipping_address_json are JSONFields, so the database
+    # adapter already decodes them. Only rows written before the setters
+    # stopped double-encoding still hold a JSON string inside the JSON.
+    
     @property
     def items(self):
-        if isinstance(self.items_json, dict):
+        if not isinstance(self.items_json, str):
             return self.items_json
         return json.loads(self.items_json)
     
     @items.setter
     def items(self, value):
-        self.items_json = json.dumps(value) if not isinstance(value, str) else value
+        self.items_json = json.loads(value) if isinstance(value, str) else value
     
     @property
     def shipping_address(self):
-        if isinstance(self.shipping_address_json, dict):
+        if not isinstance(self.shipping_address_json, str):
             return self.shipping_address_json
         return json.loads(self.shipping_address_json)
     
     @shipping_address.setter
     def shipping_address(self, value):
-        self.shipping_address_json = json.dumps(value) if not isinstance(value, str) else value
+        self.shipping_address_json = json.loads(value) if isinstance(value, str) else value
+
+    def line_items(self):
+        """
+        Normalise ``items`` into ``(product_id, quantity, unit_price)`` tuples.
+
+        Cart entries come from several clients, so the product may be keyed as
+        ``productId``, ``product_id``, ``product`` or ``id``. Product IDs and
+        quantities must be integers of at least 1; anything else comes back
+        as None rather than being coerced. A line without a quantity is one
+        unit.
+        """
+        items = self.items or []
+        if isinstance(items, dict):
+            items = [items]
+
+        lines = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            product = next((item[key] for key in ('productId', 'product_id', 'product', 'id') if item.get(key) is not None), None)
+            if isinstance(product, dict):
+                product = product.get('id')
+            try:
+                product_id = positive_int(product)
+            except ValueError:
+                product_id = None
+            try:
+                quantity = positive_int(item.get('quantity', 1))
+            except ValueError:
+                quantity = None
+            try:
+                unit_price = Decimal(str(item.get('price', item.get('unit_price'))))
+            except (InvalidOperation, ValueError):
+                unit_price = None
+            if unit_price is not None and not unit_price.is_finite():
+                unit_price = None
+            lines.append((product_id, quantity, unit_price))
+        return lines
+
+    class Meta:
+        indexes = [
+            # my_orders / UserViewSet.orders keyset pages
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Admin order history keyset pages
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username} - {self.status}"
@@ -81,5 +244,76 @@ class Notification(models.Model):
     related_order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Notification list keyset pages
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+            # Unread badge counts only touch unread rows
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.user.username}"
+
+class OrderItemQuerySet(models.QuerySet):
+    def sales_by_product(self):
+        """Units sold and revenue per product, as a single GROUP BY"""
+        return (
+            self.filter(product__isnull=False)
+            .values('product')
+            .annotate(
+                units_sold=models.Sum('quantity'),
+                revenue=models.Sum(models.F('quantity') * models.F('unit_price')),
+                orders=models.Count('order', distinct=True),
+            )
+            .order_by('-units_sold')
+        )
+
+    def build_for(self, order, prices):
+        """
+        Build (unsaved) items for ``order``. ``prices`` maps the IDs of products
+        that exist to the price charged, which is always the ``unit_price``;
+        the price the client's cart showed is only kept as ``cart_price``.
+        Lines pointing at unknown products keep a NULL product and a zero
+        price, and lines without a valid quantity are skipped.
+        """
+        items = []
+        for product_id, quantity, cart_price in order.line_items():
+            if quantity is None:
+                continue
+            if product_id not in prices:
+                product_id = None
+            items.append(self.model(
+                order=order, product_id=product_id, quantity=quantity,
+                unit_price=prices.get(product_id, Decimal('0.00')), cart_price=cart_price,
+            ))
+        return items
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
+    # Indexed by orderitem_product_sales_idx below
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='order_items', db_index=False)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The price the client's cart showed, for reference only; never charged
+    cart_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    objects = OrderItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Covers per-product aggregation with an index-only scan
+            models.Index(fields=['product'], include=['quantity', 'unit_price'], name='orderitem_product_sales_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} (order #{self.order_id})"
+
+class RevokedToken(models.Model):
+    """A refresh token that may no longer be used, until it expires; see soya_store.revocation"""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
     def __str__(self):
-        return f"{self.title} - {self.user.username}"
\ No newline at end of file
+        return self.jti
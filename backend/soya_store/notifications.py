@@ -0,0 +1,179 @@
+"""
+Notification writes that keep each user's unread counter in step.
+
+``User.unread_notifications`` is a denormalised count of the user's unread
+notifications. It is adjusted with F() expressions in the same transaction
+as the notification rows and fronted by a cache entry, so the badge endpoint
+never has to COUNT(*) the notifications table. ``reconcile`` repairs any drift.
+
+Cached counts are tagged with a per-user generation that every committed
+write bumps. A reader that loaded the count before a write committed stores
+it under the old generation, where nobody will read it, instead of serving
+the pre-commit count until the entry expires.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import User, Notification
+
+UNREAD_CACHE_TIMEOUT = getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 60)
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _generation_key(user_id):
+    return f'notifications:unread:generation:{user_id}'
+
+
+def _seed_generation(user_id):
+    """Create the user's generation if it is missing and return it"""
+    key = _generation_key(user_id)
+    # Seed from the clock so a generation lost to eviction is never reused
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def _invalidate(user_ids):
+    """Once the current transaction commits, retire the users' cached counts"""
+    def bump():
+        for user_id in user_ids:
+            try:
+                cache.incr(_generation_key(user_id))
+            except ValueError:
+                _seed_generation(user_id)
+    transaction.on_commit(bump)
+
+
+def _adjust(deltas):
+    """Apply ``{user_id: delta}`` to the stored counters in one UPDATE"""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(deltas) == 1:
+        (user_id, delta), = deltas.items()
+        change = Value(delta)
+    else:
+        change = Case(*[When(pk=user_id, then=Value(delta)) for user_id, delta in deltas.items()], default=Value(0))
+    User.objects.filter(pk__in=deltas).update(
+        unread_notifications=Greatest(F('unread_notifications') + change, Value(0))
+    )
+    _invalidate(list(deltas))
+
+
+def notify(user_id, title, message, related_order=None):
+    """Create one notification for ``user_id``"""
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user_id=user_id, title=title, message=message, related_order=related_order
+        )
+        _adjust({user_id: 1})
+    return notification
+
+
+def notify_many(notifications):
+    """Insert unsaved ``Notification`` objects with one bulk_create"""
+    deltas = {}
+    for notification in notifications:
+        if not notification.is_read:
+            deltas[notification.user_id] = deltas.get(notification.user_id, 0) + 1
+    with transaction.atomic():
+        notifications = Notification.objects.bulk_create(notifications)
+        _adjust(deltas)
+    return notifications
+
+
+def created(notification):
+    """Account for a notification saved through some other path"""
+    if not notification.is_read:
+        _adjust({notification.user_id: 1})
+
+
+def deleted(notification):
+    """Account for a deleted notification"""
+    if not notification.is_read:
+        _adjust({notification.user_id: -1})
+
+
+def changed(notification, previous_user_id, was_read):
+    """Account for an edited notification whose ``is_read`` flag or user may have changed"""
+    deltas = {previous_user_id: 0, notification.user_id: 0}
+    if not was_read:
+        deltas[previous_user_id] -= 1
+    if not notification.is_read:
+        deltas[notification.user_id] += 1
+    _adjust(deltas)
+
+
+def mark_read(user_id, notification_ids):
+    """Mark the user's notifications read; return how many were unread"""
+    with transaction.atomic():
+        count = Notification.objects.filter(
+            id__in=notification_ids, user_id=user_id, is_read=False
+        ).update(is_read=True)
+        _adjust({user_id: -count})
+    return count
+
+
+def mark_all_read(user_id):
+    """Mark every notification of the user read with a single UPDATE"""
+    with transaction.atomic():
+        count = Notification.objects.filter(user_id=user_id, is_read=False).update(is_read=True)
+        # Set rather than subtract: this also clears any drift for the user
+        User.objects.filter(pk=user_id).update(unread_notifications=0)
+        _invalidate([user_id])
+    return count
+
+
+def unread_count(user_id):
+    """Return the user's unread count: a cache read, or a primary-key lookup"""
+    key = _cache_key(user_id)
+    values = cache.get_many([_generation_key(user_id), key])
+    generation = values.get(_generation_key(user_id))
+    if generation is None:
+        generation = _seed_generation(user_id)
+    cached = values.get(key)
+    if isinstance(cached, tuple) and cached[0] == generation:
+        return cached[1]
+    # The generation was read first: if a write commits after this read,
+    # the count is stored under a generation that has already been retired
+    count = User.objects.filter(pk=user_id).values_list('unread_notifications', flat=True).first() or 0
+    cache.set(key, (generation, count), UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def _actual_unread():
+    return Coalesce(
+        Subquery(
+            Notification.objects.filter(user=OuterRef('pk'), is_read=False)
+            .order_by()
+            .values('user')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        Value(0),
+    )
+
+
+def find_drift():
+    """Return ``{user_id: (stored, actual)}`` for users whose counter has drifted"""
+    drifted = (
+        User.objects.annotate(actual=_actual_unread())
+        .exclude(unread_notifications=F('actual'))
+        .values_list('pk', 'unread_notifications', 'actual')
+    )
+    return {user_id: (stored, actual) for user_id, stored, actual in drifted}
+
+
+def reconcile(user_ids):
+    """Recompute the stored counters of ``user_ids`` from the notifications table"""
+    with transaction.atomic():
+        updated = User.objects.filter(pk__in=user_ids).update(unread_notifications=_actual_unread())
+        _invalidate(list(user_ids))
+    return updated
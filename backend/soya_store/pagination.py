@@ -0,0 +1,36 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class TimelineCursorPagination(CursorPagination):
+    """
+    Keyset pagination for time-ordered resources, newest first.
+
+    The opaque cursor encodes the last ``created_at`` seen, so every page is
+    an index range scan with no COUNT(*) and no OFFSET, and page 500 costs the
+    same as page one. ``id`` breaks ties between rows created in the same
+    instant.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the product catalog, ordered by primary key.
+    """
+    ordering = 'id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """
+    Page-number pagination for ranked search results, which are ordered by
+    relevance and therefore cannot be keyset-paginated on a column.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,46 @@
+"""
+JSON renderer backed by orjson, with DRF's stdlib renderer as the fallback.
+
+orjson is a declared dependency. The fallback is only a guard for
+environments where it could not be installed, and it logs a warning when
+used, since it gives up the speedup.
+"""
+import logging
+
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # Fall back to DRF's stdlib json renderer
+    orjson = None
+    logger.warning("orjson is not installed; JSON is rendered and parsed with the stdlib json module")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer.
+    
+    Compact, non-ASCII output is encoded by orjson, which handles str, int,
+    dict, list and date/time values natively. Everything else, including
+    datetimes (so UTC still renders as ``Z``), Decimals and lazy strings, is
+    handed to DRF's own encoder, so the output matches the stdlib renderer.
+    Indented output (the browsable API, ``; indent=`` media types) and
+    non-default UNICODE_JSON/COMPACT_JSON settings use the stdlib renderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Same strict-javascript-subset escaping as DRF
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,206 @@
+"""
+Revocation store for rotated refresh tokens.
+
+Revoked token IDs (``jti``) live in the ``RevokedToken`` table until their
+token would have expired anyway; ``purge_revoked_tokens`` deletes them after
+that. Each process keeps a bloom filter of the unexpired revocations in
+front of the table. A miss in the filter means "definitely not revoked" and
+costs no I/O. A hit is confirmed with one primary-key lookup, because bloom
+filters have false positives.
+
+The filter picks up revocations made by other processes with an indexed
+``id > last seen`` query, at most once every ``REVOCATION_SYNC_INTERVAL``
+seconds. Only the first build in a process happens on a request. After
+that, the filter is rebuilt in a background thread every
+``REVOCATION_REBUILD_INTERVAL`` seconds, or sooner once it outgrows its
+capacity, which drops expired entries. Requests keep using and syncing the
+old filter until the new one is swapped in. Expired entries only cost a
+slightly higher false positive rate, so the interval can be long.
+Rotation itself does not depend on the filter being current:
+revoking a token is an INSERT on the unique ``jti``, so a token can only
+ever be rotated once.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_INTERVAL = getattr(settings, 'REVOCATION_SYNC_INTERVAL', 1)
+REVOCATION_REBUILD_INTERVAL = getattr(settings, 'REVOCATION_REBUILD_INTERVAL', 6 * 60 * 60)
+REVOCATION_FALSE_POSITIVE_RATE = getattr(settings, 'REVOCATION_FALSE_POSITIVE_RATE', 0.001)
+
+# Rows read per query while syncing or rebuilding
+SYNC_BATCH_SIZE = 10000
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, sized for ``capacity`` items"""
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """The per-process bloom filter and the bookkeeping to keep it current"""
+    def __init__(self):
+        self.bloom = None
+        self.last_id = 0
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def _rows_after(self, last_id, unexpired_only):
+        """Yield ``(id, jti)`` in id order, in bounded batches"""
+        queryset = RevokedToken.objects.order_by('id')
+        if unexpired_only:
+            queryset = queryset.filter(expires_at__gt=timezone.now())
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).values_list('id', 'jti')[:SYNC_BATCH_SIZE])
+            yield from rows
+            if len(rows) < SYNC_BATCH_SIZE:
+                return
+            last_id = rows[-1][0]
+
+    def _build(self):
+        """A fresh filter of the unexpired revocations, and the id to sync on from"""
+        started = time.perf_counter()
+        # Expired rows are skipped, so sync from the newest row of any kind
+        last_id = RevokedToken.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        count = RevokedToken.objects.filter(expires_at__gt=timezone.now()).count()
+        # Room to double before the next rebuild is forced
+        bloom = BloomFilter(max(count * 2, 1024), REVOCATION_FALSE_POSITIVE_RATE)
+        for row_id, jti in self._rows_after(0, unexpired_only=True):
+            bloom.add(jti)
+            last_id = max(last_id, row_id)
+        logger.debug(f"Revocation filter rebuilt with {bloom.count} tokens in {time.perf_counter() - started:.3f}s")
+        return bloom, last_id
+
+    def _install(self, bloom, last_id):
+        """Swap in a built filter. Called with the lock held"""
+        self.bloom, self.last_id = bloom, last_id
+        self.built_at = self.synced_at = time.monotonic()
+
+    def rebuild(self):
+        """Build a new filter, then swap it in; syncs keep using the old one meanwhile"""
+        bloom, last_id = self._build()
+        with self.lock:
+            self._install(bloom, last_id)
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Revocation filter rebuild failed; keeping the current filter")
+            with self.lock:
+                self.built_at = time.monotonic()
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def sync(self):
+        """
+        Add revocations made since the last sync. A row whose INSERT commits
+        after a higher id was already seen is missed until the next rebuild;
+        revocations are single-row autocommits, so that window is tiny.
+        """
+        for row_id, jti in self._rows_after(self.last_id, unexpired_only=False):
+            self.bloom.add(jti)
+            self.last_id = row_id
+        self.synced_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Build the first filter, start a background rebuild or sync, whichever
+        is due. Only the first build makes callers wait for each other.
+        """
+        if self.bloom is None:
+            with self.lock:
+                if self.bloom is None:
+                    self._install(*self._build())
+            return
+
+        now = time.monotonic()
+        if now - self.built_at >= REVOCATION_REBUILD_INTERVAL or self.bloom.count > self.bloom.capacity:
+            with self.lock:
+                start, self.rebuilding = not self.rebuilding, True
+            if start:
+                threading.Thread(target=self._rebuild_in_background, name='revocation-rebuild', daemon=True).start()
+        if now - self.synced_at < REVOCATION_SYNC_INTERVAL:
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.sync()
+        finally:
+            self.lock.release()
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self.bloom
+
+    def add(self, jti):
+        if self.bloom is not None:
+            self.bloom.add(jti)
+
+
+revocation_filter = RevocationFilter()
+
+
+def is_revoked(jti):
+    """Whether the token ``jti`` has been revoked; no I/O for the common "no" answer"""
+    if not revocation_filter.might_contain(jti):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(jti, expires_at):
+    """
+    Revoke ``jti`` until ``expires_at``. Returns False if it was already
+    revoked, which makes a check-then-revoke race on the same token lose.
+    """
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    revocation_filter.add(jti)
+    return True
+
+
+def purge_expired(batch_size=10000):
+    """Delete revocations whose tokens have expired, in batches; returns how many"""
+    deleted = 0
+    while True:
+        ids = list(
+            RevokedToken.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
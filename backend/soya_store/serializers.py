@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import User, Product, Order, Notification
-import json
+from django.db import IntegrityError, transaction
+from django.utils.functional import cached_property
+from .models import User, Product, Order, OrderItem, Notification, OutOfStock
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -48,21 +49,16 @@ class UserSerializer(serializers.ModelSerializer):
         return data
     
     def create(self, validated_data):
-        # Create a new user with secure password
-        user = User.objects.create_user(
+        # Create a new user with secure password, in a single INSERT.
+        # Admin status should only be set by superusers through admin interface
+        # or specific admin-creation endpoints with proper authorization
+        return User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
             password=validated_data['password'],
+            name=validated_data.get('name', ''),
         )
         
-        if 'name' in validated_data:
-            user.name = validated_data['name']
-            
-        # Admin status should only be set by superusers through admin interface
-        # or specific admin-creation endpoints with proper authorization
-        user.save()
-        return user
-        
     def update(self, instance, validated_data):
         """
         Handle password updates securely
@@ -80,10 +76,102 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+class RegistrationSerializer(UserSerializer):
+    """
+    UserSerializer for self-service signup. The uniqueness of username and
+    email is left to the database: the user is inserted straight away and a
+    unique-constraint violation is reported as the usual field error, so a
+    signup costs one query instead of a lookup per unique field first. Any
+    other integrity error is re-raised.
+    """
+    DUPLICATE_ERRORS = {
+        'username': 'A user with that username already exists.',
+        'email': 'A user with that email already exists.',
+    }
+    
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            # The model's validators minus the UniqueValidator ModelSerializer adds
+            'username': {'validators': [User.username_validator]},
+            'email': {'validators': []},
+        }
+    
+    @staticmethod
+    def constraint_name(field_name):
+        """The name PostgreSQL gives a column's inline UNIQUE constraint"""
+        return f'{User._meta.db_table}_{User._meta.get_field(field_name).column}_key'
+    
+    def duplicate_field(self, exc):
+        """
+        Name the unique field an IntegrityError was raised for, from the
+        violated constraint the driver reports; None for any other error.
+        """
+        diag = getattr(exc.__cause__, 'diag', None)
+        constraint = getattr(diag, 'constraint_name', None)
+        for field in self.DUPLICATE_ERRORS:
+            if constraint == self.constraint_name(field):
+                return field
+        return None
+    
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as exc:
+            field = self.duplicate_field(exc)
+            if field is None:
+                raise
+            raise serializers.ValidationError({field: [self.DUPLICATE_ERRORS[field]]})
+
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['search_vector']
+
+class ProductRowSerializer:
+    """
+    Read-only fast path for catalog GETs.
+    
+    Produces exactly what ``ProductSerializer`` does, but from ``.values()``
+    rows instead of model instances. Converters are taken once from
+    ProductSerializer's own fields, and only fields whose representation
+    differs from the database value (decimals, datetimes) get called at all.
+    """
+    passthrough = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+    
+    def __init__(self, serializer_class=ProductSerializer):
+        self.serializer_class = serializer_class
+    
+    @cached_property
+    def columns(self):
+        """``(name, source, converter)`` for each readable field, in output order"""
+        columns = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            converter = None if isinstance(field, self.passthrough) else field.to_representation
+            columns.append((name, field.source, converter))
+        return tuple(columns)
+    
+    def rows(self, queryset):
+        """Restrict ``queryset`` to ``.values()`` rows of the serialized columns"""
+        return queryset.values(*[source for _, source, _ in self.columns])
+    
+    def to_representation(self, row):
+        data = {}
+        for name, source, converter in self.columns:
+            value = row[source]
+            if converter is not None and value is not None:
+                value = converter(value)
+            data[name] = value
+        return data
+    
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+product_rows = ProductRowSerializer()
 
 class OrderSerializer(serializers.ModelSerializer):
     items = serializers.JSONField(required=True)
@@ -95,23 +183,36 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def create(self, validated_data):
-        # Handle JSON fields properly
-        if isinstance(validated_data.get('items'), dict):
-            items_json = validated_data.pop('items')
-        else:
-            items_json = json.loads(validated_data.pop('items'))
+        # The parser has already decoded the body; the setters only decode
+        # clients that still send these fields as JSON-encoded strings
+        items = validated_data.pop('items')
+        shipping_address = validated_data.pop('shipping_address')
+        order = Order(**validated_data)
+        order.items = items
+        order.shipping_address = shipping_address
         
-        if isinstance(validated_data.get('shipping_address'), dict):
-            shipping_address_json = validated_data.pop('shipping_address')
-        else:
-            shipping_address_json = json.loads(validated_data.pop('shipping_address'))
+        quantities = {}
+        for product_id, quantity, _ in order.line_items():
+            if product_id is None:
+                raise serializers.ValidationError({'items': 'Each item must reference a product by its integer ID'})
+            if quantity is None:
+                raise serializers.ValidationError({'items': 'Each item quantity must be a whole number of at least 1'})
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
         
-        # Create order
-        order = Order.objects.create(
-            items_json=items_json,
-            shipping_address_json=shipping_address_json,
-            **validated_data
-        )
+        with transaction.atomic():
+            # Reserve stock for every line in one round trip
+            try:
+                prices = Product.objects.reserve_stock(quantities)
+            except OutOfStock as exc:
+                raise serializers.ValidationError({
+                    'items': [f"Product {product_id} is out of stock or unavailable" for product_id in exc.product_ids]
+                })
+            
+            # Create order
+            order.save(force_insert=True)
+            
+            # Normalised line items, written in one INSERT
+            OrderItem.objects.bulk_create(OrderItem.objects.build_for(order, prices))
         return order
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,25 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import User, Product
+from .authentication import forget_account_state
+from .catalog_cache import invalidate_catalog
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Bump the catalog version whenever a product is written or removed"""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_account_state(sender, instance, **kwargs):
+    """
+    Make StatelessJWTAuthentication re-read the account on the next request.
+    After the commit, so a request in between cannot cache the old row again.
+    """
+    transaction.on_commit(partial(forget_account_state, instance.pk))
@@ -0,0 +1,234 @@
+"""
+Deterministic synthetic data for benchmarks and load testing.
+
+Everything is generated from a seeded ``random.Random`` and written with
+``bulk_create`` in batches, so a given seed always produces the same dataset.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from . import notifications
+from .models import User, Product, Order, OrderItem, Notification
+
+CATEGORIES = [
+    'Seeds', 'Kits', 'Soil', 'Fertilizers', 'Tools', 'Planters', 'Irrigation',
+    'Pest Control', 'Books', 'Sprouting', 'Microgreens', 'Hydroponics',
+    'Greenhouse', 'Compost', 'Mulch', 'Lighting', 'Harvesting', 'Storage',
+    'Apparel', 'Gifts',
+]
+SUBCATEGORIES = ['Soybeans', 'Edamame', 'Black Soybeans', 'Organic', 'Heirloom', 'Starter', 'Bulk', 'Premium']
+ADJECTIVES = ['Organic', 'Heirloom', 'Premium', 'Non-GMO', 'Black', 'Golden', 'Giant', 'Dwarf', 'Early', 'Hardy']
+NOUNS = ['Soybean Seeds', 'Edamame Seeds', 'Starter Kit', 'Potting Mix', 'Seed Tray', 'Grow Light', 'Trowel', 'Planter']
+WORDS = (
+    'rich flavor nutritional profile perfect home gardening small scale farming premium quality '
+    'high yield drought tolerant fast germination protein dense easy grow container friendly'
+).split()
+CITIES = [('Springfield', 'IL'), ('Madison', 'WI'), ('Austin', 'TX'), ('Portland', 'OR'), ('Ames', 'IA')]
+
+# Line items per order follow a long-tailed distribution like real carts
+ITEM_COUNT_WEIGHTS = {1: 40, 2: 25, 3: 15, 4: 8, 5: 5, 6: 3, 8: 2, 12: 1, 20: 1}
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Let bulk_create write the timestamps we generate instead of now()"""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _random_past(rng, now, days=365):
+    return now - timedelta(seconds=rng.randrange(days * 24 * 60 * 60))
+
+
+def generate_users(count, rng, prefix='synthetic', batch_size=DEFAULT_BATCH_SIZE):
+    """Create ``count`` users sharing one precomputed password hash; return their IDs"""
+    password = make_password('synthetic-password-1')
+    now = timezone.now()
+
+    def rows():
+        for n in range(count):
+            username = f'{prefix}-user-{n:07d}'
+            yield User(
+                username=username,
+                email=f'{username}@example.com',
+                name=f'Synthetic User {n}',
+                password=password,
+                date_joined=_random_past(rng, now),
+            )
+
+    ids = []
+    for batch in _batches(rows(), batch_size):
+        ids.extend(user.pk for user in User.objects.bulk_create(batch))
+    return ids
+
+
+def generate_products(count, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """Create ``count`` products spread across categories; return their IDs"""
+    now = timezone.now()
+
+    def rows():
+        for n in range(count):
+            price = Decimal(rng.randrange(299, 19999)) / 100
+            on_sale = rng.random() < 0.1
+            created_at = _random_past(rng, now)
+            yield Product(
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{n}',
+                description=' '.join(rng.choice(WORDS) for _ in range(rng.randrange(15, 60))),
+                price=price,
+                category=rng.choice(CATEGORIES),
+                subcategory=rng.choice(SUBCATEGORIES),
+                image_url=f'https://images.example.com/products/{n}.jpg',
+                rating=Decimal(rng.randrange(10, 50)) / 10,
+                reviews=rng.randrange(0, 500),
+                is_featured=rng.random() < 0.01,
+                is_best_seller=rng.random() < 0.02,
+                is_on_sale=on_sale,
+                original_price=(price * Decimal('1.25')).quantize(Decimal('0.01')) if on_sale else None,
+                stock=rng.randrange(0, 1000),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    ids = []
+    with explicit_timestamps(Product):
+        for batch in _batches(rows(), batch_size):
+            ids.extend(product.pk for product in Product.objects.bulk_create(batch))
+    return ids
+
+
+def generate_orders(count, user_ids, products, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create ``count`` orders, with their OrderItem rows, for random users.
+    ``products`` is a sequence of ``(id, name, price)`` tuples to draw line
+    items from. Returns the count.
+    """
+    now = timezone.now()
+    prices = {product_id: price for product_id, _, price in products}
+    statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+    item_counts = list(ITEM_COUNT_WEIGHTS)
+    item_weights = list(ITEM_COUNT_WEIGHTS.values())
+
+    def rows():
+        for _ in range(count):
+            lines = rng.sample(products, min(rng.choices(item_counts, item_weights)[0], len(products)))
+            items = []
+            total = Decimal('0.00')
+            for product_id, name, price in lines:
+                quantity = rng.randrange(1, 5)
+                total += price * quantity
+                items.append({'productId': product_id, 'name': name, 'price': str(price), 'quantity': quantity})
+            city, state = rng.choice(CITIES)
+            created_at = _random_past(rng, now)
+            user_id = rng.choice(user_ids)
+            yield Order(
+                user_id=user_id,
+                status=rng.choice(statuses),
+                total=total,
+                items_json=items,
+                # Same keys as the storefront's address form
+                shipping_address_json={
+                    'fullName': f'Synthetic User {user_id}',
+                    'addressLine1': f'{rng.randrange(1, 9999)} Main St',
+                    'city': city,
+                    'state': state,
+                    'postalCode': f'{rng.randrange(10000, 99999)}',
+                    'country': 'US',
+                    'phone': f'555{rng.randrange(1000000, 9999999)}',
+                },
+                payment_method=rng.choice(['Credit Card', 'PayPal', 'Bank Transfer']),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    created = 0
+    with explicit_timestamps(Order):
+        for batch in _batches(rows(), batch_size):
+            orders = Order.objects.bulk_create(batch)
+            OrderItem.objects.bulk_create(
+                [item for order in orders for item in OrderItem.objects.build_for(order, prices)],
+                batch_size=batch_size,
+            )
+            created += len(orders)
+    return created
+
+
+def generate_notifications(count, user_ids, rng, read_ratio=0.7, batch_size=DEFAULT_BATCH_SIZE):
+    """Create ``count`` notifications for random users; return how many were unread"""
+    now = timezone.now()
+    unread = 0
+
+    def rows():
+        nonlocal unread
+        for n in range(count):
+            is_read = rng.random() < read_ratio
+            unread += not is_read
+            yield Notification(
+                user_id=rng.choice(user_ids),
+                title='Order Status Updated',
+                message=f'Your order status has been updated ({n})',
+                is_read=is_read,
+                created_at=_random_past(rng, now),
+            )
+
+    with explicit_timestamps(Notification):
+        for batch in _batches(rows(), batch_size):
+            notifications.notify_many(batch)
+    return unread
+
+
+def generate_dataset(users=1000, products=10000, orders=50000, notifications=50000, seed=42,
+                     prefix='synthetic', batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Generate a complete dataset and return the created IDs.
+
+    ``progress``, if given, is called as ``progress(stage, count, seconds)``
+    after each stage.
+    """
+    rng = random.Random(seed)
+    progress = progress or (lambda stage, count, seconds: None)
+
+    started = time.perf_counter()
+    user_ids = generate_users(users, rng, prefix=prefix, batch_size=batch_size)
+    progress('users', len(user_ids), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    product_ids = generate_products(products, rng, batch_size=batch_size)
+    progress('products', len(product_ids), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    catalog = list(
+        Product.objects.filter(pk__in=product_ids[:5000]).order_by('id').values_list('id', 'name', 'price')
+    )
+    created = generate_orders(orders, user_ids, catalog, rng, batch_size=batch_size)
+    progress('orders', created, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    generate_notifications(notifications, user_ids, rng, batch_size=batch_size)
+    progress('notifications', notifications, time.perf_counter() - started)
+    return {'user_ids': user_ids, 'product_ids': product_ids}
@@ -1,3 +1,529 @@
-from django.test import TestCase
+import datetime
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from soya_project.cache_backends import LockingFileBasedCache
+from soya_project.middleware import SecurityMiddleware
+from . import catalog_cache, synthetic
+from .benchmarks import queries
+from .models import Notification, Order, OrderItem, OutOfStock, Product, User
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer, orjson
+from .throttling import CounterUserRateThrottle, incr_counter
+
+# The production tiering over an in-memory shared cache, so tests never touch CACHE_DIR
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'soya_project.cache_backends.TieredCache',
+        'OPTIONS': {'SHARED': 'shared', 'LOCAL_KEY_PREFIXES': ['catalog:']},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'soya-store-tests',
+    },
+}
+
+
+def make_product(**fields):
+    return Product.objects.create(**{
+        'name': 'Edamame', 'description': 'Young soybeans', 'price': Decimal('4.99'),
+        'category': 'Beans', 'image_url': '', 'stock': 10, **fields,
+    })
+
+
+def shared_throttle(shared, rate):
+    """A user throttle class counting in ``shared`` instead of the default cache"""
+    return type('SharedThrottle', (CounterUserRateThrottle,), {'cache': shared, 'rate': rate})
+
+
+def client_request(ident):
+    return SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=ident))
+
+
+def spend_in_child(directory, tag, increments, limit, results):
+    """Runs in a forked process with its own cache instance on the shared directory"""
+    shared = LockingFileBasedCache(directory, {})
+    for _ in range(increments):
+        incr_counter(f'{tag}:counter', 600, shared)
+    throttle_class = shared_throttle(shared, f'{limit}/hour')
+    request = client_request(tag)
+    results.put(sum(throttle_class().allow_request(request, None) for _ in range(limit)))
+
+
+class LockingFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache = LockingFileBasedCache(directory, {})
+
+    def test_day_window_survives_a_five_minute_gap(self):
+        self.cache.add('window', 1, 24 * 60 * 60)
+        self.assertEqual(self.cache.incr('window'), 2)
+
+        after_gap = time.time() + 5 * 60 + 1
+        with mock.patch('time.time', return_value=after_gap):
+            self.assertEqual(self.cache.get('window'), 2)
+            self.assertEqual(self.cache.incr('window'), 3)
+
+        later_that_day = time.time() + 23 * 60 * 60
+        with mock.patch('time.time', return_value=later_that_day):
+            self.assertEqual(self.cache.get('window'), 3)
+
+        next_day = time.time() + 24 * 60 * 60 + 1
+        with mock.patch('time.time', return_value=next_day):
+            self.assertIsNone(self.cache.get('window'))
+            with self.assertRaises(ValueError):
+                self.cache.incr('window')
+
+    def test_decr_keeps_the_expiry(self):
+        self.cache.add('window', 5, 60 * 60)
+        self.assertEqual(self.cache.decr('window', 2), 3)
+        with mock.patch('time.time', return_value=time.time() + 30 * 60):
+            self.assertEqual(self.cache.get('window'), 3)
+
+    def test_incr_of_a_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class SharedThrottleTests(SimpleTestCase):
+    """Throttle windows kept in the shared file cache, as every worker process sees them"""
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.throttle_class = shared_throttle(LockingFileBasedCache(directory, {}), '10/minute')
+        self.request = client_request('shopper')
+        # The start of a one-minute window
+        self.start = (time.time() // 60 - 1) * 60
+
+    def allow_at(self, offset):
+        throttle = self.throttle_class()
+        throttle.timer = lambda: self.start + offset
+        return throttle.allow_request(self.request, None)
+
+    def test_limit_within_a_window(self):
+        self.assertEqual([self.allow_at(1) for _ in range(11)], [True] * 10 + [False])
+
+    def test_previous_window_counts_by_its_overlap(self):
+        for _ in range(10):
+            self.assertTrue(self.allow_at(1))
+        # A new window that still fully overlaps the last one has no room
+        self.assertFalse(self.allow_at(60))
+        # Halfway through, the previous window weighs 5 of the 10
+        self.assertEqual([self.allow_at(90) for _ in range(6)], [True] * 5 + [False])
+        # Two windows on, the first one has expired from view
+        self.assertEqual([self.allow_at(180) for _ in range(11)], [True] * 10 + [False])
+
+    def test_rejected_requests_do_not_count(self):
+        for _ in range(30):
+            self.allow_at(1)
+        self.assertEqual([self.allow_at(90) for _ in range(6)], [True] * 5 + [False])
+
+
+@skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+class SharedCountsAcrossProcessesTests(SimpleTestCase):
+    PROCESSES = 4
+
+    def test_counters_and_throttles_are_shared(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(target=spend_in_child, args=(directory, 'shared', 200, 25, results))
+            for _ in range(self.PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        admitted = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join(timeout=10)
+            self.assertEqual(process.exitcode, 0)
+
+        shared = LockingFileBasedCache(directory, {})
+        self.assertEqual(shared.get('shared:counter'), self.PROCESSES * 200)
+        # Each process alone would have admitted all 25 of its requests
+        self.assertEqual(sum(admitted), 25)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogCacheStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = make_product()
+
+    def test_counts_hits_and_misses(self):
+        self.assertEqual(self.client.get(reverse('product-list'))['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('product-list'))['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('product-detail', args=[self.product.pk]))['X-Catalog-Cache'], 'MISS')
+
+        admin = User.objects.create_user('admin', 'admin@example.com', 'Admin-password-1!', is_admin=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('product-catalog-cache-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 2)
+        self.assertEqual(response.data['hit_ratio'], round(1 / 3, 4))
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get(reverse('product-catalog-cache-stats')).status_code, 401)
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'Shopper-password-1!')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(reverse('product-catalog-cache-stats')).status_code, 403)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL')
+class QueryIndexTests(TestCase):
+    """The hot query of each endpoint is planned on the index migration 0003 added for it"""
+    INDEXES = {
+        'featured-products': 'product_featured_idx',
+        'bestseller-products': 'product_bestseller_idx',
+        'products-by-category': 'product_category_idx',
+        'search-products': 'product_search_vector_gin',
+        'order-list': 'order_created_idx',
+        'my-orders': 'order_user_created_idx',
+        'notification-list': 'notification_user_created_idx',
+        'unread-notifications-count': 'notification_unread_idx',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        user_ids = synthetic.generate_users(50, rng, prefix='test')
+        product_ids = synthetic.generate_products(2000, rng)
+        catalog = list(Product.objects.filter(pk__in=product_ids[:200]).order_by('id').values_list('id', 'name', 'price'))
+        synthetic.generate_orders(2000, user_ids, catalog, rng)
+        synthetic.generate_notifications(2000, user_ids, rng)
+        cls.user_id = user_ids[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for model in (Product, Order, Notification):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+            # Small tables are cheaper to scan; make the planner show its index choice
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_endpoint_queries_use_their_indexes(self):
+        for name, queryset in queries.endpoint_queries(self.user_id).items():
+            with self.subTest(name):
+                _, nodes = queries.explain(queryset)
+                self.assertNotIn('Seq Scan', [node['type'] for node in nodes])
+                indexes = {node['index'] for node in nodes if node['type'] in queries.INDEX_NODES}
+                if name in self.INDEXES:
+                    self.assertIn(self.INDEXES[name], indexes)
+                else:
+                    self.assertTrue(indexes)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'reserve_stock is PostgreSQL SQL')
+@override_settings(CACHES=TEST_CACHES)
+class StockReservationRaceTests(TransactionTestCase):
+    """Concurrent checkouts on real connections, each in its own transaction"""
+    THREADS = 24
+
+    def hammer(self, reserve):
+        """Run ``reserve`` from THREADS threads at once; return what each one ended with"""
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+        lock = threading.Lock()
+
+        def checkout():
+            try:
+                barrier.wait()
+                try:
+                    with transaction.atomic():
+                        reserve()
+                        # Hold the row locks a moment so the others queue on them
+                        time.sleep(0.01)
+                    outcome = 'reserved'
+                except OutOfStock:
+                    outcome = 'out of stock'
+                except Exception as exc:
+                    outcome = repr(exc)
+                with lock:
+                    outcomes.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertFalse(any(thread.is_alive() for thread in threads), 'checkouts piled up on the row locks')
+        return outcomes
+
+    def test_one_sku_is_never_oversold(self):
+        product = make_product(stock=10)
+        outcomes = self.hammer(lambda: Product.objects.reserve_stock({product.pk: 1}))
+        self.assertEqual(outcomes.count('reserved'), 10)
+        self.assertEqual(outcomes.count('out of stock'), self.THREADS - 10)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+
+    def test_orders_locking_products_in_any_order_do_not_deadlock(self):
+        first, second = make_product(stock=100), make_product(name='Tofu', stock=100)
+        orders = iter([{first.pk: 1, second.pk: 1}, {second.pk: 1, first.pk: 1}] * self.THREADS)
+        outcomes = self.hammer(lambda: Product.objects.reserve_stock(next(orders)))
+        self.assertEqual(outcomes, ['reserved'] * self.THREADS)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (100 - self.THREADS, 100 - self.THREADS))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = make_product()
+
+    def test_validators_on_catalog_responses(self):
+        for url in (reverse('product-list'), reverse('product-detail', args=[self.product.pk]), reverse('featured-products')):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Last-Modified', response)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(reverse('product-list'))['ETag']
+        response = self.client.get(reverse('product-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_unchanged_since_last_modified_is_not_modified(self):
+        last_modified = self.client.get(reverse('product-list'))['Last-Modified']
+        response = self.client.get(reverse('product-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_product_change_invalidates_validators(self):
+        first = self.client.get(reverse('product-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('5.49')
+            self.product.save()
+
+        response = self.client.get(reverse('product-list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['results'][0]['price'], '5.49')
+        response = self.client.get(reverse('product-list'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_published_stock_changes_the_etag(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        first = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            catalog_cache.publish_stock({self.product.pk: 3})
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(response.data['stock'], 3)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OrderLineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'Shopper-password-1!')
+        self.client.force_authenticate(self.user)
+        self.product = make_product()
+
+    def place(self, item):
+        return self.client.post(reverse('order-list'), {
+            'user': self.user.pk, 'total': '4.99', 'items': [item],
+            'shipping_address': {'city': 'Portland'}, 'payment_method': 'Credit Card',
+        }, format='json')
+
+    def test_bad_lines_are_rejected_without_touching_stock(self):
+        bad_lines = [
+            {'productId': self.product.pk, 'quantity': 0},
+            {'productId': self.product.pk, 'quantity': -5},
+            {'productId': self.product.pk, 'quantity': 1.9},
+            {'productId': self.product.pk, 'quantity': True},
+            {'productId': self.product.pk, 'quantity': '2'},
+            {'productId': 1.9, 'quantity': 1},
+            {'productId': True, 'quantity': 1},
+        ]
+        for item in bad_lines:
+            with self.subTest(item):
+                response = self.place(item)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('items', response.data)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_items_are_priced_from_the_catalog(self):
+        order = Order(user=self.user, total=Decimal('0.01'))
+        order.items = [
+            {'productId': self.product.pk, 'quantity': 2, 'price': '0.01'},
+            {'productId': 999999, 'quantity': 1, 'price': '3.00'},
+            {'productId': self.product.pk, 'quantity': 0},
+        ]
+        items = OrderItem.objects.build_for(order, {self.product.pk: Decimal('4.99')})
+        self.assertEqual(
+            [(item.product_id, item.quantity, item.unit_price, item.cart_price) for item in items],
+            [(self.product.pk, 2, Decimal('4.99'), Decimal('0.01')), (None, 1, Decimal('0.00'), Decimal('3.00'))],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkOrderStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        admin = User.objects.create_user('admin', 'admin@example.com', 'Admin-password-1!', is_admin=True)
+        self.client.force_authenticate(admin)
+        self.shoppers = [
+            User.objects.create_user(f'shopper{n}', f'shopper{n}@example.com', 'Shopper-password-1!')
+            for n in range(2)
+        ]
+        self.orders = [
+            Order.objects.create(
+                user=shopper, total=Decimal('4.99'), items_json=[],
+                shipping_address_json={}, payment_method='Credit Card', status=current,
+            )
+            for shopper, current in zip(self.shoppers + self.shoppers[:1], ['pending', 'pending', 'shipped'])
+        ]
+
+    def bulk(self, body):
+        return self.client.post(reverse('order-bulk-update-order-status'), body, format='json')
+
+    def test_each_changed_order_notifies_its_owner_once(self):
+        response = self.bulk({'ids': [order.pk for order in self.orders] + [999999], 'status': 'shipped'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertEqual(response.data['missing'], [999999])
+        self.assertEqual(
+            sorted(Notification.objects.values_list('related_order_id', 'user_id')),
+            [(order.pk, order.user_id) for order in self.orders[:2]],
+        )
+
+    def test_bad_ids_and_bodies_are_rejected(self):
+        order_id = self.orders[0].pk
+        bad_bodies = [
+            {'ids': [order_id + 0.9], 'status': 'shipped'},
+            {'ids': [True], 'status': 'shipped'},
+            {'ids': [str(order_id)], 'status': 'shipped'},
+            {'ids': [0], 'status': 'shipped'},
+            {'ids': order_id, 'status': 'shipped'},
+            [order_id],
+        ]
+        for body in bad_bodies:
+            with self.subTest(body):
+                self.assertEqual(self.bulk(body).status_code, 400)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(Order.objects.filter(status='shipped').exclude(pk=self.orders[2].pk).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.products = [make_product(name=f'Edamame {n}') for n in range(3)]
+
+    def test_results_follow_the_requested_order(self):
+        first, second, third = (product.pk for product in self.products)
+        ids = [third, 999999, first, third, second]
+        for response in (
+            self.client.get(reverse('product-batch'), {'ids': ','.join(map(str, ids))}),
+            self.client.post(reverse('product-batch'), {'ids': ids}, format='json'),
+        ):
+            with self.subTest(response.request['REQUEST_METHOD']):
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([row['id'] for row in response.data['results']], [third, first, second])
+                self.assertEqual(response.data['missing'], [999999])
+
+    @override_settings(PRODUCT_BATCH_MAX=2)
+    def test_too_many_ids_are_rejected(self):
+        ids = [product.pk for product in self.products]
+        self.assertEqual(self.client.post(reverse('product-batch'), {'ids': ids}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(reverse('product-batch'), {'ids': ids[:2]}, format='json').status_code, 200)
+
+    def test_bad_ids_and_bodies_are_rejected(self):
+        product_id = self.products[0].pk
+        for body in ([product_id], {'ids': [1.9]}, {'ids': [True]}, {'ids': [0]}, {'ids': product_id}, {}):
+            with self.subTest(body):
+                self.assertEqual(self.client.post(reverse('product-batch'), body, format='json').status_code, 400)
+        for ids in ('1.9', 'true', '-1', '0'):
+            with self.subTest(ids):
+                self.assertEqual(self.client.get(reverse('product-batch'), {'ids': ids}).status_code, 400)
+
+
+@skipUnless(orjson, 'orjson is not installed')
+class FastJSONParityTests(SimpleTestCase):
+    payload = {
+        'price': Decimal('4.99'),
+        'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'ship_on': datetime.date(2024, 5, 2),
+        'cutoff': datetime.time(17, 45),
+        'reference': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'name': 'Tōfu & 豆腐 \u2028 \u2029 "quoted"',
+        'label': gettext_lazy('Pending'),
+        'counts': {1: 2, 'three': [0.1, -4, None, True]},
+        'items': [{'productId': 7, 'quantity': 2, 'price': Decimal('12.50')}],
+    }
+
+    def assert_same(self, accepted_media_type=None, renderer_context=None):
+        expected = JSONRenderer().render(self.payload, accepted_media_type, renderer_context)
+        rendered = FastJSONRenderer().render(self.payload, accepted_media_type, renderer_context)
+        self.assertEqual(rendered, expected)
+        return rendered
+
+    def test_compact_output_matches_the_stdlib_renderer(self):
+        self.assert_same('application/json')
+
+    def test_indented_output_matches_the_stdlib_renderer(self):
+        self.assertIn(b'\n    ', self.assert_same('application/json; indent=4'))
+        # The browsable API asks for indentation through the renderer context
+        self.assertIn(b'\n    ', self.assert_same('application/json', {'indent': 4}))
+
+    def test_parsed_body_matches_the_stdlib_parser(self):
+        body = self.assert_same()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+
+
+class SecurityScanExemptionTests(SimpleTestCase):
+    injection = {'q': "' UNION SELECT password FROM soya_store_user --"}
+
+    def setUp(self):
+        self.middleware = SecurityMiddleware(lambda request: HttpResponse())
+        self.factory = RequestFactory()
+
+    def test_only_whole_exempt_paths_skip_the_scan(self):
+        for path in ('/api/products/', '/api/products/7/', '/api/products/featured/', '/static/css/site.css'):
+            with self.subTest(path):
+                self.assertIsNone(self.middleware.scan_request(self.factory.get(path, self.injection)))
+        for path in ('/api/products/search/', '/api/products/by_category/', '/api/products/7/extra/', '/api/orders/'):
+            with self.subTest(path):
+                self.assertEqual(self.middleware.scan_request(self.factory.get(path, self.injection)), 'sql')
+
+    def test_writes_to_exempt_paths_are_scanned(self):
+        request = self.factory.post('/api/products/', {'name': '<script>alert(1)</script>'}, content_type='application/json')
+        self.assertEqual(self.middleware.scan_request(request), 'xss')
@@ -1,11 +1,87 @@
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.throttling import SimpleRateThrottle, AnonRateThrottle, UserRateThrottle
 import logging
 from django.core.cache import cache
+from soya_project import metrics
 
 # Setup logger
 logger = logging.getLogger('django.security')
 
-class LoginRateThrottle(AnonRateThrottle):
+
+def incr_counter(key, timeout, cache=cache):
+    """
+    Atomically increment ``key``, creating it with ``timeout`` on first use.
+    Returns the new value.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        # Another worker created it between our incr and add
+        return cache.incr(key)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Rate throttle backed by two integer counters per client instead of a
+    pickled timestamp history.
+    
+    Requests are counted in fixed windows of the rate's duration; the
+    previous window's count is weighted by how much of it still overlaps the
+    sliding window. A request costs one atomic increment plus one read,
+    whatever the rate, and concurrent workers cannot both slip in under the
+    limit because the increment happens before the check.
+    """
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f'{self.key}:{window}'
+        # Counters live for two windows: their own, then as the previous one
+        self.current = incr_counter(current_key, self.duration * 2, self.cache)
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        
+        elapsed = (self.now % self.duration) / self.duration
+        if self.previous * (1 - elapsed) + self.current > self.num_requests:
+            # Rejected requests do not count against the client
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+    
+    def throttle_success(self):
+        return True
+    
+    def throttle_failure(self):
+        metrics.throttle_rejected(self.scope)
+        return super().throttle_failure()
+    
+    def wait(self):
+        """Seconds until the sliding window has room for one more request"""
+        offset = self.now % self.duration
+        remaining = self.duration - offset
+        room = self.num_requests - self.current - 1
+        if room < 0 or not self.previous:
+            return remaining
+        # Wait for the previous window's weighted share to decay enough
+        return min(remaining, max(0.0, (1 - room / self.previous) * self.duration - offset))
+
+
+class CounterAnonRateThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    """Drop-in replacement for DRF's AnonRateThrottle"""
+
+
+class CounterUserRateThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    """Drop-in replacement for DRF's UserRateThrottle"""
+
+
+class LoginRateThrottle(CounterAnonRateThrottle):
     """
     Throttle class specifically for login attempts.
     More strict than the general rate limits.
@@ -21,15 +97,14 @@ class LoginRateThrottle(AnonRateThrottle):
         if len(username) > 0:
             # Log excessive login attempts
             key = f'login_attempt_{ip}_{username}'
-            attempts = cache.get(key, 0)
             
             # Increment the counter
-            cache.set(key, attempts + 1, 60 * 60)  # 1 hour expiration
+            attempts = incr_counter(key, 60 * 60)  # 1 hour expiration
             
             # Log suspicious activity
-            if attempts >= 3:
-                logger.warning(f"Multiple login attempts detected for username '{username}' from IP {ip} - {attempts+1} attempts")
-                
+            if attempts > 3:
+                logger.warning(f"Multiple login attempts detected for username '{username}' from IP {ip} - {attempts} attempts")
+            
             return self.cache_format % {
                 'scope': self.scope,
                 'ident': f"{ip}_{username}"
@@ -40,7 +115,7 @@ class LoginRateThrottle(AnonRateThrottle):
         }
 
 
-class RegisterRateThrottle(AnonRateThrottle):
+class RegisterRateThrottle(CounterAnonRateThrottle):
     """
     Throttle class specifically for registration attempts.
     To prevent spamming of user accounts.
@@ -53,16 +128,15 @@ class RegisterRateThrottle(AnonRateThrottle):
         
         # Log excessive registration attempts
         key = f'register_attempt_{ip}'
-        attempts = cache.get(key, 0)
         
         # Increment the counter
-        cache.set(key, attempts + 1, 60 * 60 * 24)  # 24 hour expiration
+        attempts = incr_counter(key, 60 * 60 * 24)  # 24 hour expiration
         
         # Log suspicious activity
-        if attempts >= 2:
-            logger.warning(f"Multiple registration attempts detected from IP {ip} - {attempts+1} attempts")
-            
+        if attempts > 2:
+            logger.warning(f"Multiple registration attempts detected from IP {ip} - {attempts} attempts")
+        
         return self.cache_format % {
             'scope': self.scope,
             'ident': ip
-        }
\ No newline at end of file
+        }
@@ -1,19 +1,32 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.generics import get_object_or_404
 from django.contrib.auth import authenticate
-from django.db.models import Q
-from .models import User, Product, Order, Notification
-from .serializers import UserSerializer, ProductSerializer, OrderSerializer, NotificationSerializer
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .models import User, Product, Order, Notification, positive_int
+from .serializers import UserSerializer, RegistrationSerializer, ProductSerializer, OrderSerializer, NotificationSerializer, product_rows
+from django.http import JsonResponse, StreamingHttpResponse
 from django.urls import path
+from . import catalog_cache, exports, notifications
+from .pagination import TimelineCursorPagination, ProductCursorPagination, SearchResultsPagination
+
+def parse_id(value):
+    """A primary key from a JSON integer or a string of ASCII digits; ValueError for anything else"""
+    if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        value = int(value)
+    return positive_int(value)
 
 class IsAdminUser(permissions.BasePermission):
     """
     Custom permission to only allow admin users to access the view.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_admin
+        return bool(request.user and request.user.is_authenticated and request.user.is_admin)
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -45,37 +58,89 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"detail": "You do not have permission to view this user's orders."}, 
                             status=status.HTTP_403_FORBIDDEN)
         
-        orders = Order.objects.filter(user_id=pk).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(user_id=pk)
+        paginator = TimelineCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
     
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['list', 'retrieve']:  # Anyone can see products
+        if self.action in ['list', 'retrieve', 'featured', 'bestsellers', 'by_category', 'search', 'batch']:  # Anyone can see products
             permission_classes = [permissions.AllowAny]
         else:  # Only admins can create, update, delete
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def cached_response(self, request, build, *key_parts, include_query=True):
+        """
+        Serve a catalog payload from the versioned cache, calling ``build``
+        to produce (and cache) the response on a miss. The query string is
+        part of the key unless ``include_query`` is False, for views whose
+        ``key_parts`` already capture everything the payload depends on.
+        
+        Responses carry the cached entry's ETag and Last-Modified, and a
+        matching ``If-None-Match``/``If-Modified-Since`` is answered with 304
+        straight from the cache entry, without touching product rows.
+        """
+        key = catalog_cache.make_key(self.action, request, *key_parts, include_query=include_query)
+        entry = catalog_cache.lookup(key)
+        if entry is not None:
+            response = Response(entry.data, headers={'X-Catalog-Cache': 'HIT'})
+        else:
+            response = build()
+            response['X-Catalog-Cache'] = 'MISS'
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = catalog_cache.store(key, response.data)
+        
+        live = catalog_cache.with_live_stock(entry)
+        if live is not entry:
+            entry = live
+            response.data = entry.data
+        response['ETag'] = entry.etag
+        if entry.last_modified is not None:
+            response['Last-Modified'] = http_date(entry.last_modified)
+        return get_conditional_response(
+            request, etag=entry.etag, last_modified=entry.last_modified, response=response
+        )
+    
+    def list(self, request, *args, **kwargs):
+        def build():
+            page = self.paginate_queryset(product_rows.rows(self.filter_queryset(self.get_queryset())))
+            return self.get_paginated_response(product_rows.many(page))
+        return self.cached_response(request, build)
+    
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        
+        def build():
+            row = get_object_or_404(product_rows.rows(self.get_queryset()), **{self.lookup_field: kwargs[lookup_url_kwarg]})
+            return Response(product_rows.to_representation(row))
+        return self.cached_response(request, build, kwargs[lookup_url_kwarg])
+    
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def featured(self, request):
         """Return featured products"""
-        featured_products = Product.objects.filter(is_featured=True)
-        serializer = self.get_serializer(featured_products, many=True)
-        return Response(serializer.data)
+        def build():
+            featured_products = Product.objects.filter(is_featured=True)
+            return Response(product_rows.many(product_rows.rows(featured_products)))
+        return self.cached_response(request, build)
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def bestsellers(self, request):
         """Return bestseller products"""
-        bestsellers = Product.objects.filter(is_best_seller=True)
-        serializer = self.get_serializer(bestsellers, many=True)
-        return Response(serializer.data)
+        def build():
+            bestsellers = Product.objects.filter(is_best_seller=True)
+            return Response(product_rows.many(product_rows.rows(bestsellers)))
+        return self.cached_response(request, build)
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def by_category(self, request):
@@ -85,27 +150,73 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Category parameter is required"}, 
                             status=status.HTTP_400_BAD_REQUEST)
         
-        products = Product.objects.filter(category=category)
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        def build():
+            products = Product.objects.filter(category=category)
+            return Response(product_rows.many(product_rows.rows(products)))
+        return self.cached_response(request, build)
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def search(self, request):
-        """Search products by name or description"""
+        """Search products by name, category and description, best matches first"""
         query = request.query_params.get('q', None)
         if query is None:
             return Response({"detail": "Search query parameter 'q' is required"}, 
                             status=status.HTTP_400_BAD_REQUEST)
         
-        products = Product.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        products = Product.objects.search(query)
+        paginator = SearchResultsPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get', 'post'], url_path='batch')
+    def batch(self, request):
+        """
+        Return many products by ID in one query, in the order requested, e.g.
+        to hydrate a cart. IDs come from ``?ids=1,2,3`` or a POST body of
+        ``{"ids": [1, 2, 3]}``; IDs with no product are listed under
+        ``missing``.
+        """
+        if request.method == 'POST':
+            if not isinstance(request.data, dict):
+                return Response({"detail": "Expected an object with ids"}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+            product_ids = request.data.get('ids', [])
+        else:
+            product_ids = request.query_params.get('ids', '')
+            product_ids = [product_id for product_id in product_ids.split(',') if product_id.strip()]
+        if not product_ids or not isinstance(product_ids, list):
+            return Response({"detail": "A list of product IDs is required"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(product_ids) > settings.PRODUCT_BATCH_MAX:
+            return Response({"detail": f"At most {settings.PRODUCT_BATCH_MAX} products can be fetched at once"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Duplicates are dropped, keeping the first occurrence's position
+            product_ids = list(dict.fromkeys(parse_id(product_id) for product_id in product_ids))
+        except ValueError:
+            return Response({"detail": "Product IDs must be integers"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        def build():
+            rows = product_rows.rows(self.get_queryset().filter(id__in=product_ids))
+            found = {row['id']: row for row in rows}
+            return Response({
+                'results': [product_rows.to_representation(found[product_id]) for product_id in product_ids if product_id in found],
+                'missing': [product_id for product_id in product_ids if product_id not in found],
+            })
+        # Keyed on the parsed IDs alone, so GET and POST for the same IDs share an entry
+        return self.cached_response(request, build, ','.join(map(str, product_ids)), include_query=False)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='cache-stats', url_name='catalog-cache-stats')
+    def cache_stats(self, request):
+        """Return catalog cache hit/miss counters - admin only"""
+        return Response(catalog_cache.stats())
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = TimelineCursorPagination
     
     def get_permissions(self):
         """
@@ -122,9 +233,10 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_orders(self, request):
         """Return the authenticated user's orders"""
-        orders = Order.objects.filter(user=request.user).order_by('-created_at')
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(user=request.user)
+        page = self.paginate_queryset(orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     def perform_create(self, serializer):
         """Set the user to the authenticated user on create"""
@@ -150,8 +262,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         # Create notification for user
         message = f"Your order #{order.id} status has been updated to: {status_value}"
-        Notification.objects.create(
-            user=order.user,
+        notifications.notify(
+            user_id=order.user_id,
             title="Order Status Updated",
             message=message,
             related_order=order
@@ -160,9 +272,112 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], url_path='bulk-status', url_name='bulk-update-order-status')
+    def bulk_update_status(self, request):
+        """Update the status of many orders at once - admin only"""
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Expected an object with ids and status"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        order_ids = request.data.get('ids', [])
+        status_value = request.data.get('status')
+        if not order_ids or not isinstance(order_ids, list):
+            return Response({"detail": "A list of order IDs is required"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(order_ids) > settings.BULK_ORDER_STATUS_MAX:
+            return Response({"detail": f"At most {settings.BULK_ORDER_STATUS_MAX} orders can be updated at once"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order_ids = {positive_int(order_id) for order_id in order_ids}
+        except ValueError:
+            return Response({"detail": "Order IDs must be integers"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not status_value:
+            return Response({"detail": "Status is required"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        # Validate status value
+        valid_statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+        if status_value not in valid_statuses:
+            return Response({"detail": f"Invalid status. Choose from: {', '.join(valid_statuses)}"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            # Lock the orders and learn who owns them in one query
+            orders = Order.objects.select_for_update().filter(id__in=order_ids).values_list('id', 'user_id', 'status')
+            found = set()
+            owners = []
+            for order_id, user_id, current in orders:
+                found.add(order_id)
+                if current != status_value:
+                    owners.append((order_id, user_id))
+            
+            updated = Order.objects.filter(id__in=[order_id for order_id, _ in owners]).update(
+                status=status_value, updated_at=timezone.now()
+            )
+            
+            # Notify every owner with a single INSERT
+            notifications.notify_many([
+                Notification(
+                    user_id=user_id,
+                    title="Order Status Updated",
+                    message=f"Your order #{order_id} status has been updated to: {status_value}",
+                    related_order_id=order_id,
+                )
+                for order_id, user_id in owners
+            ])
+        
+        return Response({
+            "status": status_value,
+            "updated": updated,
+            "unchanged": len(found) - updated,
+            "missing": sorted(order_ids - found),
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='export', url_name='export-orders')
+    def export(self, request):
+        """
+        Stream matching orders as CSV or NDJSON - admin only.
+        
+        Query params: ``output`` (csv or ndjson, default csv), ``status``
+        (comma-separated), ``created_after`` and ``created_before`` (ISO
+        dates or datetimes; a date means midnight at the start of that day).
+        """
+        output_format = request.query_params.get('output', 'csv')
+        if output_format not in exports.FORMATS:
+            return Response({"detail": f"Invalid output. Choose from: {', '.join(exports.FORMATS)}"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+        valid_statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+        invalid = [value for value in statuses if value not in valid_statuses]
+        if invalid:
+            return Response({"detail": f"Invalid status. Choose from: {', '.join(valid_statuses)}"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        bounds = {}
+        for param in ('created_after', 'created_before'):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            bound = exports.parse_bound(value)
+            if bound is None:
+                return Response({"detail": f"{param} must be an ISO date or datetime"}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+            bounds[param] = bound
+        
+        queryset = exports.export_queryset(statuses, **bounds)
+        response = StreamingHttpResponse(
+            exports.stream(exports.order_records(queryset), output_format),
+            content_type=exports.FORMATS[output_format],
+        )
+        filename = f"orders-{timezone.now():%Y%m%d-%H%M%S}.{output_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    pagination_class = TimelineCursorPagination
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -173,6 +388,21 @@ class NotificationViewSet(viewsets.ModelViewSet):
             return Notification.objects.all().order_by('-created_at')
         return Notification.objects.filter(user=user).order_by('-created_at')
     
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            notifications.created(serializer.save())
+    
+    def perform_update(self, serializer):
+        previous_user_id, was_read = serializer.instance.user_id, serializer.instance.is_read
+        with transaction.atomic():
+            notification = serializer.save()
+            notifications.changed(notification, previous_user_id, was_read)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            notifications.deleted(instance)
+    
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def mark_read(self, request):
         """Mark notifications as read"""
@@ -182,16 +412,20 @@ class NotificationViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         
         # Only update notifications that belong to the user
-        notifications = Notification.objects.filter(id__in=notification_ids, user=request.user)
-        notifications.update(is_read=True)
+        count = notifications.mark_read(request.user.id, notification_ids)
         
-        return Response({"detail": f"{notifications.count()} notifications marked as read"})
+        return Response({"detail": f"{count} notifications marked as read"})
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated], url_path='mark-all-read', url_name='mark-all-notifications-read')
+    def mark_all_read(self, request):
+        """Mark all of the user's notifications as read"""
+        count = notifications.mark_all_read(request.user.id)
+        return Response({"detail": f"{count} notifications marked as read"})
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def unread_count(self, request):
         """Return count of unread notifications"""
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({"count": count})
+        return Response({"count": notifications.unread_count(request.user.id)})
 
 # Import throttling classes
 from .throttling import LoginRateThrottle, RegisterRateThrottle
@@ -237,9 +471,9 @@ def login_view(request):
     else:
         # Log failed login attempt
         logger.warning(f"Failed login attempt for username: {username}")
-        # Use a consistent response time to prevent timing attacks
-        import time
-        time.sleep(1)  # Delay response to prevent timing attacks
+        # No artificial delay: authenticate() runs the password hasher even for
+        # unknown usernames, so failures already take as long as successes
+        # without idling the worker. Brute force is bounded by LoginRateThrottle.
         return Response(
             {"detail": "Invalid credentials"}, 
             status=status.HTTP_401_UNAUTHORIZED
@@ -260,35 +494,18 @@ def register_view(request):
             status=status.HTTP_429_TOO_MANY_REQUESTS
         )
     
-    # Input validation with additional security checks
-    # These checks are in addition to what's in UserSerializer
-    email = request.data.get('email', '')
-    username = request.data.get('username', '')
-    
-    # Check if user already exists to prevent enumeration attacks
-    if User.objects.filter(username=username).exists():
-        # Use a consistent response time
-        import time
-        time.sleep(1)
-        logger.info(f"Registration attempt with existing username: {username}")
-        return Response(
-            {"username": ["A user with that username already exists."]},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    if User.objects.filter(email=email).exists():
-        # Use a consistent response time
-        import time
-        time.sleep(1)
-        logger.info(f"Registration attempt with existing email: {email}")
-        return Response(
-            {"email": ["A user with that email already exists."]},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    serializer = UserSerializer(data=request.data)
+    # Uniqueness is checked by the INSERT itself. A duplicate username or
+    # email is only detected after create_user has hashed the password, so
+    # it takes as long as a successful signup and cannot be told apart by
+    # latency.
+    serializer = RegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except serializers.ValidationError as exc:
+            field = next(iter(exc.detail))
+            logger.info(f"Registration attempt with existing {field}: {serializer.validated_data[field]}")
+            return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
         # Log successful registration
         logger.info(f"New user registered: {user.username} (ID: {user.id})")
         return Response(serializer.data, status=status.HTTP_201_CREATED)